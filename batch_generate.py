@@ -0,0 +1,69 @@
+"""
+Пакетная генерация лабиринтов в несколько процессов (без интерфейса)
+
+Результат - набор уровней в формате maze_file (читается через LevelPack).
+
+Пример:
+    python batch_generate.py --count 1000 --width 19 --height 15 --seed-start 0 -o levels.lbrp
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from maze import Maze, ALGORITHMS, ALGORITHM_BACKTRACKING
+from maze_file import LevelPackWriter, encode_maze
+
+
+def generate_record(task):
+    """Сгенерировать один лабиринт в процессе-воркере.
+
+    Возвращает готовую запись формата maze_file (бит на клетку), а не
+    список CellType, чтобы передача между процессами была компактной.
+    """
+    width, height, seed, algorithm = task
+    return encode_maze(Maze(width, height, algorithm, seed))
+
+
+def iter_tasks(args):
+    """Задания для воркеров: по одному на seed"""
+    for seed in range(args.seed_start, args.seed_start + args.count):
+        yield (args.width, args.height, seed, args.algorithm)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Пакетная генерация лабиринтов")
+    parser.add_argument("-n", "--count", type=int, default=100, help="количество лабиринтов")
+    parser.add_argument("--width", type=int, default=19, help="ширина лабиринта (нечетная)")
+    parser.add_argument("--height", type=int, default=15, help="высота лабиринта (нечетная)")
+    parser.add_argument("--seed-start", type=int, default=0, help="первый seed диапазона")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default=ALGORITHM_BACKTRACKING)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="число процессов")
+    parser.add_argument("--chunk-size", type=int, default=16, help="лабиринтов на одно задание")
+    parser.add_argument("-o", "--output", default="mazes.lbrp", help="выходной набор уровней")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Сгенерировать лабиринты и записать их в один набор уровней"""
+    args = parse_args(argv)
+    start_time = time.perf_counter()
+
+    with LevelPackWriter(args.output) as output, \
+            ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # map отдает результаты по порядку seed, запись идет потоком
+        for record in executor.map(generate_record, iter_tasks(args),
+                                   chunksize=args.chunk_size):
+            output.add_record(record)
+        written = len(output)
+
+    elapsed = time.perf_counter() - start_time
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(f"Сгенерировано лабиринтов: {written} за {elapsed:.2f} с ({rate:.1f} лабиринтов/с)")
+    print(f"Файл: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,333 @@
+"""
+Набор замеров производительности (без окна)
+
+Замеряет генерацию лабиринтов по размерам, отрисовку в память (SDL dummy),
+скорость интерпретатора на типичных детских программах, такт гонки
+агентов и задержку нажатия клавиши в редакторе. Результаты пишутся в JSON, и два таких
+файла можно сравнить (--compare), чтобы увидеть регрессии.
+
+Пример:
+    python benchmark.py -o before.json
+    python benchmark.py --suite interpreter --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Отрисовка идет в память: окно не нужно
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"  # Приветствие pygame испортило бы JSON в stdout
+
+from maze import Maze, ALGORITHMS
+from player import Player, CommandInterpreter
+from code_buffer import CodeBuffer
+
+# Размеры лабиринтов для генерации и отрисовки
+SIZE_TIERS = {
+    'small': (13, 9),
+    'medium': (19, 15),
+    'large': (101, 101),
+    'huge': (1001, 1001),
+}
+BENCHMARK_SEED = 12345
+
+# Типичные программы игроков
+KID_PROGRAMS = {
+    'straight_line': "\n".join(["move_right()", "move_down()", "move_left()", "move_up()"] * 25),
+    'for_loop': "for i in range(100):\n    move_right()\n    move_left()",
+    'wall_follower': (
+        "steps = [move_right, move_down, move_left, move_up]\n"
+        "d = 0\n"
+        "while not is_at_finish():\n"
+        "    if steps[(d + 1) % 4]():\n"
+        "        d = (d + 1) % 4\n"
+        "    elif not steps[d]():\n"
+        "        d = (d + 3) % 4\n"
+    ),
+    'runs': "for i in range(25):\n    run_right()\n    run_down()\n    run_left()\n    run_up()",
+}
+
+# Холодный старт отдельным процессом: код и цель (секунды, None - без цели).
+# Ядро и режим без окна не должны загружать pygame вовсе.
+COLD_START_SCRIPTS = {
+    'core': ("import sys, maze, player\n"
+             "m = maze.Maze(19, 15, seed=1)\n"
+             "p = player.Player(*m.start_pos)\n"
+             "player.CommandInterpreter(p, m).execute_code('move_right()')\n"
+             "assert 'pygame' not in sys.modules, 'ядро загрузило pygame'\n"),
+    'headless': ("import sys, main\n"
+                 "main.MazeGame(headless=True).run_script([('code', 'move_right()')])\n"
+                 "assert 'pygame' not in sys.modules, 'режим без окна загрузил pygame'\n"),
+    'ui': "import main\nmain.MazeGame()\n",
+}
+COLD_START_TARGETS = {'core': 0.1, 'headless': 0.15, 'ui': None}
+
+# Насколько медленнее (в разах) считается регрессией при сравнении
+DEFAULT_THRESHOLD = 1.2
+
+
+def measure(func, repeat=5, number=1):
+    """Запустить func number раз подряд repeat раз; время одного вызова (секунды)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def bench_generation(quick):
+    """Генерация лабиринтов по размерам и алгоритмам"""
+    results = {}
+    for tier, (width, height) in SIZE_TIERS.items():
+        if quick and tier == 'huge':
+            continue
+        repeat = 3 if tier == 'huge' else 5
+        number = 1 if tier in ('large', 'huge') else 20
+        for algorithm in ALGORITHMS:
+            stats = measure(lambda: Maze(width, height, algorithm, BENCHMARK_SEED),
+                            repeat, number)
+            stats['cells'] = width * height
+            results[f"{algorithm}/{tier}"] = stats
+    return results
+
+
+def bench_rendering(quick):
+    """Отрисовка лабиринта в память: полный кадр, кадр с ходом игрока, мини-карта"""
+    import pygame
+    from colors import WINDOW_WIDTH, WINDOW_HEIGHT
+    from ui import UI
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    results = {}
+    for tier, (width, height) in SIZE_TIERS.items():
+        if quick and tier == 'huge':
+            continue
+        maze = Maze(width, height, seed=BENCHMARK_SEED)
+        ui = UI(screen)
+        player = Player(*maze.start_pos)
+        ui.draw_maze(maze, player)
+
+        def full_frame():
+            ui.build_maze_surface(maze)
+            ui.draw_maze(maze, player)
+
+        # Игрок ходит туда-обратно по первому открытому соседу старта
+        start = maze.start_pos
+        neighbor = next((x, y) for x, y in ((start[0] + 1, start[1]), (start[0], start[1] + 1))
+                        if maze.is_valid_move(x, y))
+
+        def move_frame():
+            player.move_to(*(neighbor if player.get_position() == start else start))
+            ui.draw_maze(maze, player)
+            ui.draw_minimap(maze, player)
+
+        results[f"full_frame/{tier}"] = measure(full_frame, 5, 5)
+        results[f"move_frame/{tier}"] = measure(move_frame, 5, 50)
+        results[f"minimap_build/{tier}"] = measure(lambda: ui.minimap.set_maze(maze), 3, 3)
+    pygame.quit()
+    return results
+
+
+def bench_interpreter(quick):
+    """Скорость выполнения программ игроков (команд в секунду), с машиной ходов и без"""
+    maze = Maze(*SIZE_TIERS['medium'], seed=BENCHMARK_SEED)
+    results = {}
+    for name, code in KID_PROGRAMS.items():
+        for use_vm in (True, False):
+            player = Player(*maze.start_pos)
+            interpreter = CommandInterpreter(player, maze, use_vm=use_vm)
+            success, message = interpreter.execute_code(code)
+            if not success:
+                raise RuntimeError(f"Программа {name} не выполнилась: {message}")
+            commands = interpreter.execution_log.total
+
+            def run():
+                interpreter.player.reset_position()
+                interpreter.execute_code(code)
+
+            stats = measure(run, 3 if quick else 5, 5 if quick else 20)
+            stats['commands'] = commands
+            stats['commands_per_second'] = commands / stats['median'] if stats['median'] else 0.0
+            results[f"{name}/{'vm' if use_vm else 'exec'}"] = stats
+    return results
+
+
+def bench_agents(quick):
+    """Такт гонки: рой агентов со случайными направлениями на большом лабиринте"""
+    from race import AgentSwarm
+    maze = Maze(*SIZE_TIERS['large'], seed=BENCHMARK_SEED)
+    rng = random.Random(BENCHMARK_SEED)
+    results = {}
+    for count in (30, 1000) if quick else (30, 1000, 10000):
+        swarm = AgentSwarm(maze, count)
+        directions = bytes(rng.randrange(4) for _ in range(count))
+        stats = measure(lambda: swarm.step(directions), 5, 20 if quick else 100)
+        stats['agents'] = count
+        stats['vectorized'] = swarm.vectorized
+        stats['agent_steps_per_second'] = count / stats['median'] if stats['median'] else 0.0
+        results[f"tick/{count}_agents"] = stats
+    return results
+
+
+def bench_editor(quick):
+    """Задержка нажатия клавиши в редакторе на программах разной длины"""
+    results = {}
+    for line_count in (10, 1000) if quick else (10, 1000, 10000):
+        text = "\n".join("move_right()" for _ in range(line_count))
+        buffer = CodeBuffer(text)
+        buffer.move_cursor(lines=-(line_count // 2))
+
+        def keystroke():
+            buffer.insert("x")
+            buffer.backspace()
+            buffer.get_visible_lines()
+
+        results[f"keystroke/{line_count}_lines"] = measure(keystroke, 5, 200)
+    return results
+
+
+def bench_startup(quick):
+    """Холодный старт: новый процесс Python импортирует игру и выполняет программу"""
+    results = {}
+    baseline = None
+    for name, script in [('python', "pass")] + list(COLD_START_SCRIPTS.items()):
+        command = [sys.executable, "-c", script]
+        timings = []
+        for _ in range(3 if quick else 7):
+            start = time.perf_counter()
+            subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                           stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        stats = {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.fmean(timings),
+            'repeat': len(timings),
+            'number': 1,
+        }
+        if name == 'python':
+            baseline = stats['median']
+        else:
+            target = COLD_START_TARGETS[name]
+            stats['over_python'] = stats['median'] - baseline
+            stats['target'] = target
+            stats['meets_target'] = target is None or stats['median'] <= target
+        results[name] = stats
+    return results
+
+
+SUITES = {
+    'startup': bench_startup,
+    'generation': bench_generation,
+    'rendering': bench_rendering,
+    'interpreter': bench_interpreter,
+    'agents': bench_agents,
+    'editor': bench_editor,
+}
+
+
+def get_environment():
+    """Описание окружения, чтобы сравнивать сопоставимые результаты"""
+    try:
+        import pygame
+        pygame_version = pygame.version.ver
+    except ImportError:
+        pygame_version = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'pygame': pygame_version,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_suites(names, quick=False):
+    """Выполнить наборы замеров и собрать отчет"""
+    report = {'environment': get_environment(), 'quick': quick, 'results': {}}
+    for name in names:
+        print(f"Набор {name}...", file=sys.stderr)
+        report['results'][name] = SUITES[name](quick)
+    return report
+
+
+def compare_reports(old, new, threshold=DEFAULT_THRESHOLD):
+    """Сравнить медианы двух отчетов: [(набор/замер, старое, новое, во сколько раз, регрессия)]"""
+    rows = []
+    for suite, benchmarks in new['results'].items():
+        old_benchmarks = old.get('results', {}).get(suite, {})
+        for name, stats in benchmarks.items():
+            if name not in old_benchmarks:
+                continue
+            before, after = old_benchmarks[name]['median'], stats['median']
+            ratio = after / before if before else float('inf')
+            rows.append((f"{suite}/{name}", before, after, ratio, ratio > threshold))
+    return rows
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Замеры производительности игры")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="какой набор запустить (можно несколько; по умолчанию все)")
+    parser.add_argument("--quick", action="store_true", help="меньше повторов, без самых больших лабиринтов")
+    parser.add_argument("-o", "--output", help="файл для JSON-отчета (по умолчанию stdout)")
+    parser.add_argument("--compare", metavar="JSON", help="прошлый отчет для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="во сколько раз медленнее считать регрессией")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Запустить замеры, записать отчет и (если нужно) сравнить с прошлым"""
+    args = parse_args(argv)
+    report = run_suites(args.suite or list(SUITES), args.quick)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text)
+    else:
+        print(text)
+
+    failures = 0
+    for name, stats in report['results'].get('startup', {}).items():
+        if stats.get('meets_target') is False:
+            print(f"ЦЕЛЬ НЕ ДОСТИГНУТА: старт {name} {stats['median'] * 1e3:.0f} мс "
+                  f"> {stats['target'] * 1e3:.0f} мс", file=sys.stderr)
+            failures += 1
+
+    if not args.compare:
+        return 1 if failures else 0
+    with open(args.compare, encoding="utf-8") as old_file:
+        old_report = json.load(old_file)
+    regressions = 0
+    for name, before, after, ratio, regressed in compare_reports(old_report, report, args.threshold):
+        mark = "РЕГРЕССИЯ" if regressed else "ok"
+        print(f"{mark:10} {name:45} {before * 1e3:10.3f} мс -> {after * 1e3:10.3f} мс (x{ratio:.2f})",
+              file=sys.stderr)
+        regressions += regressed
+    return 1 if regressions or failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+"""
+Буфер текста редактора кода
+
+Текст хранится списком строк, а курсор - парой (строка, колонка), поэтому
+вставка, удаление и перемещение курсора стоят пропорционально длине
+текущей строки, а не всего текста. Целиком текст склеивается только
+при запросе (например, перед выполнением) и кэшируется до следующего
+изменения.
+
+EditorState - текст кода и вывода без pygame: на нем построен UI, и им же
+обходится режим без окна.
+"""
+
+
+class CodeBuffer:
+    """Построчный буфер с курсором и окном видимых строк"""
+
+    def __init__(self, text="", visible_lines=8):
+        self.visible_lines = visible_lines
+        self.set_text(text)
+
+    def set_text(self, text):
+        """Заменить весь текст; курсор - в конец"""
+        self.lines = text.split('\n')
+        self.cursor_line = len(self.lines) - 1
+        self.cursor_column = len(self.lines[-1])
+        self.top_line = 0  # Первая видимая строка
+        self.text_cache = text
+        self.scroll_to_cursor()
+
+    def get_text(self):
+        """Весь текст (склеивается один раз после изменения)"""
+        if self.text_cache is None:
+            self.text_cache = '\n'.join(self.lines)
+        return self.text_cache
+
+    def __len__(self):
+        """Число строк"""
+        return len(self.lines)
+
+    def changed(self):
+        self.text_cache = None
+        self.scroll_to_cursor()
+
+    def insert(self, text):
+        """Вставить текст в позицию курсора (может содержать переводы строк)"""
+        line = self.lines[self.cursor_line]
+        before, after = line[:self.cursor_column], line[self.cursor_column:]
+        parts = text.split('\n')
+        if len(parts) == 1:
+            self.lines[self.cursor_line] = before + text + after
+            self.cursor_column += len(text)
+        else:
+            parts[0] = before + parts[0]
+            self.cursor_column = len(parts[-1])
+            parts[-1] += after
+            self.lines[self.cursor_line:self.cursor_line + 1] = parts
+            self.cursor_line += len(parts) - 1
+        self.changed()
+
+    def backspace(self):
+        """Удалить символ перед курсором (в начале строки - склеить с предыдущей)"""
+        if self.cursor_column > 0:
+            line = self.lines[self.cursor_line]
+            self.lines[self.cursor_line] = line[:self.cursor_column - 1] + line[self.cursor_column:]
+            self.cursor_column -= 1
+        elif self.cursor_line > 0:
+            line = self.lines.pop(self.cursor_line)
+            self.cursor_line -= 1
+            self.cursor_column = len(self.lines[self.cursor_line])
+            self.lines[self.cursor_line] += line
+        else:
+            return False
+        self.changed()
+        return True
+
+    def delete(self):
+        """Удалить символ под курсором (в конце строки - склеить со следующей)"""
+        line = self.lines[self.cursor_line]
+        if self.cursor_column < len(line):
+            self.lines[self.cursor_line] = line[:self.cursor_column] + line[self.cursor_column + 1:]
+        elif self.cursor_line < len(self.lines) - 1:
+            self.lines[self.cursor_line] += self.lines.pop(self.cursor_line + 1)
+        else:
+            return False
+        self.changed()
+        return True
+
+    def move_cursor(self, lines=0, columns=0):
+        """Сдвинуть курсор на lines строк и columns символов (с переходом через края строк)"""
+        if lines:
+            self.cursor_line = max(0, min(self.cursor_line + lines, len(self.lines) - 1))
+            self.cursor_column = min(self.cursor_column, len(self.lines[self.cursor_line]))
+        column = self.cursor_column + columns
+        if column < 0 and self.cursor_line > 0:
+            self.cursor_line -= 1
+            column = len(self.lines[self.cursor_line])
+        elif column > len(self.lines[self.cursor_line]) and self.cursor_line < len(self.lines) - 1:
+            self.cursor_line += 1
+            column = 0
+        self.cursor_column = max(0, min(column, len(self.lines[self.cursor_line])))
+        self.scroll_to_cursor()
+
+    def move_to_line_start(self):
+        self.cursor_column = 0
+
+    def move_to_line_end(self):
+        self.cursor_column = len(self.lines[self.cursor_line])
+
+    def scroll_to_cursor(self):
+        """Сдвинуть окно видимых строк так, чтобы курсор был в нем"""
+        if self.cursor_line < self.top_line:
+            self.top_line = self.cursor_line
+        elif self.cursor_line >= self.top_line + self.visible_lines:
+            self.top_line = self.cursor_line - self.visible_lines + 1
+
+    def get_visible_lines(self):
+        """Видимые строки: [(номер строки, текст)]"""
+        end = min(len(self.lines), self.top_line + self.visible_lines)
+        return [(index, self.lines[index]) for index in range(self.top_line, end)]
+
+    def get_cursor(self):
+        """Курсор: (строка, колонка)"""
+        return self.cursor_line, self.cursor_column
+
+    def get_cursor_prefix(self):
+        """Часть строки до курсора (для измерения его положения на экране)"""
+        return self.lines[self.cursor_line][:self.cursor_column]
+
+
+class EditorState:
+    """Текст кода и вывода без отрисовки (основа UI и режима без окна)"""
+
+    def __init__(self):
+        self.code_buffer = CodeBuffer(visible_lines=8)
+        self.output_text = "Добро пожаловать в игру!\nВведите команды для движения игрока."
+
+    @property
+    def code_text(self):
+        """Текст кода целиком"""
+        return self.code_buffer.get_text()
+
+    def set_code_text(self, text):
+        """Установить текст кода"""
+        self.code_buffer.set_text(text)  # Курсор в конец текста
+
+    def get_code_text(self):
+        """Получить текст кода"""
+        return self.code_buffer.get_text()
+
+    def set_output_text(self, text):
+        """Установить текст вывода"""
+        self.output_text = text
+
+    def add_character(self, char):
+        """Добавить символ (или вставленный текст) в позицию курсора"""
+        self.code_buffer.insert(char)
+
+    def remove_character(self):
+        """Удалить символ перед курсором"""
+        self.code_buffer.backspace()
+
+    def delete_character(self):
+        """Удалить символ под курсором"""
+        self.code_buffer.delete()
@@ -26,6 +26,8 @@ class GameState(Enum):
     EDITING_CODE = 3
     EXECUTING = 4
     GAME_OVER = 5
+    REPLAY = 6
+    RACE = 7
 
 class CellType(Enum):
     """Типы клеток лабиринта"""
@@ -34,10 +36,23 @@ class CellType(Enum):
     START = 2
     FINISH = 3
 
+# Цвет клетки лабиринта по ее типу
+CELL_COLORS = {
+    CellType.WALL: Colors.BROWN,
+    CellType.PATH: Colors.WHITE,
+    CellType.START: Colors.GREEN,
+    CellType.FINISH: Colors.ORANGE,
+}
+
+# Смещения (dx, dy) по коду направления: вверх, вниз, влево, вправо
+# (в том же порядке, что коды команд COMMAND_UP..COMMAND_RIGHT в move_log)
+DIRECTION_DELTAS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
 # Константы игры
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 800
 FPS = 60
+IDLE_WAIT_MS = 1000  # Сколько спать в простое без событий, прежде чем проверить состояние
 
 # Размеры областей
 MAZE_WIDTH = 800
@@ -54,3 +69,43 @@ DEFAULT_MAZE_HEIGHT = 15
 
 EASY_MAZE_WIDTH = 13
 EASY_MAZE_HEIGHT = 9
+
+# Кэш лабиринтов и диапазон случайных seed для новых уровней
+MAZE_CACHE_SIZE = 32
+MAZE_SEED_RANGE = 2 ** 32
+
+# Проигрывание ходов программы: скорость (ходов в секунду) и размер очереди
+PLAYBACK_SPEED = 8
+EXECUTION_QUEUE_SIZE = 256
+
+# Размер кэша отрисованного текста
+TEXT_CACHE_SIZE = 256
+
+# Камера для больших лабиринтов: пределы размера клетки (пиксели) и отступ до края
+MIN_CELL_SIZE = 8
+MAX_CELL_SIZE = 64
+CAMERA_MARGIN = 3  # Сколько клеток от игрока до края, прежде чем камера сдвинется
+SCROLL_STEP = 5  # На сколько клеток сдвигает вид одно нажатие стрелки
+
+# Мини-карта под лабиринтом (показывается, когда лабиринт не помещается целиком)
+MINIMAP_X = MAZE_START_X
+MINIMAP_Y = MAZE_START_Y + MAZE_HEIGHT + 40
+MINIMAP_WIDTH = 200
+MINIMAP_HEIGHT = 130
+
+# Профилирование кадров: сколько последних кадров хранить и где рисовать HUD
+FRAME_PROFILE_SIZE = 600
+HUD_X = MINIMAP_X + MINIMAP_WIDTH + 20
+HUD_Y = MINIMAP_Y
+HUD_WIDTH = 300
+HUD_HEIGHT = 100
+
+# Повторы: файл по умолчанию (F5 - сохранить, F6 - посмотреть)
+REPLAY_PATH = "replay.lbrr"
+
+# Гонка программ: цвета агентов (по номеру по кругу) и сколько строк таблицы показывать
+AGENT_COLORS = (
+    (230, 25, 75), (60, 180, 75), (0, 130, 200), (245, 130, 48),
+    (145, 30, 180), (70, 200, 200), (240, 50, 230), (128, 128, 0),
+)
+RACE_STANDINGS_SIZE = 4
@@ -0,0 +1,134 @@
+"""
+Профилирование кадров основного цикла
+
+Для каждого кадра записывается, сколько заняла каждая фаза цикла
+(ожидание событий, обработка событий, update, draw, tick). Записи лежат в
+кольцевом буфере из типизированных массивов (RingArrays), так что память
+не растет, а замер стоит пару вызовов perf_counter на фазу. Последние
+кадры можно выгрузить в JSON или в формат Chrome Trace (chrome://tracing,
+Perfetto).
+"""
+
+import json
+import time
+from move_log import RingArrays
+from colors import FRAME_PROFILE_SIZE
+
+# Фазы кадра в порядке выполнения
+PHASE_WAIT = 0     # Ожидание событий (в простое - сон, это не нагрузка)
+PHASE_EVENTS = 1   # handle_events, включая синхронный execute_code
+PHASE_UPDATE = 2
+PHASE_DRAW = 3
+PHASE_TICK = 4     # clock.tick: ограничение FPS
+PHASE_NAMES = ("wait", "events", "update", "draw", "tick")
+
+# По скольким последним кадрам считает панель (около 2 секунд при 60 FPS)
+HUD_WINDOW = 120
+
+# Куда выгружать по клавише F4
+PROFILE_JSON_PATH = "frame_profile.json"
+PROFILE_TRACE_PATH = "frame_trace.json"
+
+# Фазы, которые входят во "время кадра" (работа, а не сон)
+WORK_PHASES = (PHASE_EVENTS, PHASE_UPDATE, PHASE_DRAW)
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль уже отсортированного списка (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class FrameProfiler:
+    """Кольцевой журнал длительностей фаз для последних capacity кадров"""
+
+    def __init__(self, capacity=FRAME_PROFILE_SIZE):
+        # Колонки: начало кадра, затем по длительности на фазу (секунды)
+        self.frames = RingArrays("d" * (1 + len(PHASE_NAMES)), capacity)
+        self.origin = time.perf_counter()
+        self.frame_start = self.phase_start = self.origin
+        self.durations = [0.0] * len(PHASE_NAMES)
+
+    def begin_frame(self):
+        """Начать новый кадр"""
+        self.frame_start = self.phase_start = time.perf_counter()
+        self.durations = [0.0] * len(PHASE_NAMES)
+
+    def end_phase(self, phase):
+        """Закончить фазу: время с конца прошлой фазы записывается в нее"""
+        now = time.perf_counter()
+        self.durations[phase] += now - self.phase_start
+        self.phase_start = now
+
+    def end_frame(self):
+        """Записать кадр в журнал"""
+        self.frames.append(self.frame_start - self.origin, *self.durations)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get_frames(self, last=None):
+        """Последние last кадров (все хранимые, если None): [(начало, длительности)]"""
+        count = len(self.frames) if last is None else min(last, len(self.frames))
+        frames = []
+        for index in range(len(self.frames) - count, len(self.frames)):
+            row = self.frames.row(index)
+            frames.append((row[0], row[1:]))
+        return frames
+
+    def get_stats(self, last=None):
+        """FPS, p50/p99 времени кадра (без ожидания) и самая долгая фаза"""
+        frames = self.get_frames(last)
+        if not frames:
+            return {'frames': 0, 'fps': 0.0, 'p50': 0.0, 'p99': 0.0, 'slowest_phase': None,
+                    'total_frames': self.frames.total}
+
+        work_times = sorted(sum(durations[phase] for phase in WORK_PHASES)
+                            for _, durations in frames)
+        phase_totals = [sum(durations[phase] for _, durations in frames)
+                        for phase in range(len(PHASE_NAMES))]
+        slowest = max(WORK_PHASES, key=lambda phase: phase_totals[phase])
+
+        first_start = frames[0][0]
+        last_start, last_durations = frames[-1]
+        span = last_start + sum(last_durations) - first_start
+        return {
+            'frames': len(frames),
+            'total_frames': self.frames.total,
+            'fps': len(frames) / span if span > 0 else 0.0,
+            'p50': percentile(work_times, 0.50),
+            'p99': percentile(work_times, 0.99),
+            'slowest_phase': PHASE_NAMES[slowest],
+            'slowest_phase_mean': phase_totals[slowest] / len(frames),
+        }
+
+    def export_json(self, path, last=None):
+        """Выгрузить кадры в JSON: по записи на кадр, длительности в миллисекундах"""
+        records = []
+        for start, durations in self.get_frames(last):
+            record = {'start_ms': start * 1e3}
+            for name, duration in zip(PHASE_NAMES, durations):
+                record[name + '_ms'] = duration * 1e3
+            records.append(record)
+        with open(path, "w", encoding="utf-8") as output_file:
+            json.dump({'stats': self.get_stats(last), 'frames': records}, output_file, indent=1)
+        return len(records)
+
+    def export_chrome_trace(self, path, last=None):
+        """Выгрузить кадры в формате Chrome Trace (события "X", микросекунды)"""
+        events = []
+        for number, (start, durations) in enumerate(self.get_frames(last)):
+            timestamp = start * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': timestamp, 'dur': sum(durations) * 1e6,
+                           'args': {'frame': number}})
+            for name, duration in zip(PHASE_NAMES, durations):
+                if duration > 0:
+                    events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                                   'ts': timestamp, 'dur': duration * 1e6})
+                timestamp += duration * 1e6
+        with open(path, "w", encoding="utf-8") as output_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, output_file)
+        return len(events)
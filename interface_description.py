@@ -24,6 +24,8 @@ class GameState(Enum):
     EDITING_CODE = 3
     EXECUTING = 4
     GAME_OVER = 5
+    REPLAY = 6
+    RACE = 7
 
 class CellType(Enum):
     """Типы клеток лабиринта"""
@@ -32,67 +34,212 @@ class CellType(Enum):
     START = 2
     FINISH = 3
 
+# Смещения (dx, dy) по коду направления: вверх, вниз, влево, вправо
+DIRECTION_DELTAS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
 #file: maze.py
+ALGORITHMS = ("backtracking", "eller")
+
 class Maze:
     """Класс для генерации и управления лабиринтом"""
-    def __init__(self, width=13, height=9):
+    def __init__(self, width=13, height=9, algorithm="backtracking", seed=None):
+        # cells - компактная сетка bytearray, один байт (код CellType) на клетку
+        ...
+    @classmethod
+    def from_cells(cls, width, height, cells, start_pos=(1, 1), finish_pos=None,
+                   algorithm="backtracking", seed=None):
+        ...
+    def save(self, path):
+        ...
+    @classmethod
+    def load(cls, path):
+        ...
+    @property
+    def grid(self):
+        """Сетка в виде списка строк из CellType (медленно, только для совместимости)"""
         ...
     def generate_maze(self):
-        """Генерация лабиринта алгоритмом рекурсивного backtracking"""
+        """Генерация лабиринта выбранным алгоритмом (backtracking или Эллер)"""
         ...
     def ensure_finish_accessible(self):
         ...
+    def get_cell_code(self, x, y):
+        ...
     def get_cell_type(self, x, y):
         ...
+    def set_cell_type(self, x, y, cell_type):
+        ...
+    def get_grid_buffer(self):
+        ...
     def is_valid_move(self, x, y):
         ...
+    def get_free_run(self, x, y, direction):
+        """Сколько клеток можно пройти в направлении до стены"""
+        ...
     def is_finish(self, x, y):
         ...
     def get_maze_info(self):
         ...
 
-    #file: player.py
-    class Player:
-        ...
-        def __init__(self, start_x, start_y):
-            ...
-        def reset_position(self):
-            ...
-        def set_start_position(self, x, y):
-            ...
-        def move_to(self, new_x, new_y):
-            ...
-        def get_position(self):
-            ...
-        def get_stats(self):
-            ...
-        def is_at_finish(self, finish_pos: tuple):
-            ...
-
-    class CommandInterpreter:
-        """Интерпретатор команд для управления игроком"""
-        def __init__(self, player, maze):
-            ...
-        def clear_logs(self):
-            ...
-        def log_move(self, command, success, message=""):
-            ...
-        def move_up(self):
-            ...
-        def move_down(self):
-            ...
-        def move_left(self):
-            ...
-        def move_right(self):
-            ...
-        def get_position(self):
-            ...
-        def is_at_finish(self):
-            ...
-        def execute_code(self, code):
-            ...
-        def get_execution_summary(self):
-            ...
+class MazeCache:
+    def __init__(self, max_size=32):
+        ...
+    def get(self, width, height, seed, algorithm="backtracking"):
+        ...
+
+#file: move_log.py
+class MoveHistory:
+    """История перемещений игрока: откуда и куда (колонки array, можно кольцом)"""
+    def __init__(self, capacity=None):
+        ...
+    def append_move(self, old_pos, new_pos):
+        ...
+    def __len__(self):
+        ...
+    def __getitem__(self, index):
+        """((old_x, old_y), (new_x, new_y))"""
+        ...
+
+class MoveLog:
+    """Журнал выполнения команд"""
+    def __init__(self, capacity=None):
+        ...
+    def log(self, command_code, success, position, steps=1, requested=1):
+        ...
+    def recent(self, count):
+        """Последние count записей (сообщения строятся только для них)"""
+        ...
+
+#file: player.py
+class Player:
+    def __init__(self, start_x, start_y, history_limit=None, recorder=None):
+        # move_history - MoveHistory, recorder - replay.ReplayRecorder или None
+        ...
+    def reset_position(self):
+        ...
+    def set_start_position(self, x, y):
+        ...
+    def move_to(self, new_x, new_y, steps=1):
+        ...
+    def get_position(self):
+        ...
+    def get_stats(self):
+        ...
+    def is_at_finish(self, finish_pos: tuple):
+        ...
+
+class CommandInterpreter:
+    """Интерпретатор команд для управления игроком"""
+    def __init__(self, player, maze, max_moves=10000, max_lines=500000,
+                 time_limit=2.0, log_limit=None, use_vm=True):
+        # execution_log - MoveLog; move_listener - слушатель ходов (фоновое выполнение)
+        ...
+    def clear_logs(self):
+        ...
+    def log_move(self, command, success, steps=1, requested=1):
+        ...
+    def cancel(self):
+        ...
+
+    # Команды, доступные в коде игрока
+    def move_up(self, steps=1):
+        ...
+    def move_down(self, steps=1):
+        ...
+    def move_left(self, steps=1):
+        ...
+    def move_right(self, steps=1):
+        ...
+    def run_up(self):
+        """Бежать до стены; возвращает число пройденных клеток"""
+        ...
+    def run_down(self):
+        ...
+    def run_left(self):
+        ...
+    def run_right(self):
+        ...
+    def get_position(self):
+        ...
+    def is_at_finish(self):
+        ...
+
+    def compile_code(self, code):
+        ...
+    def execute_code(self, code):
+        """Выполнить код пользователя: (успех, сообщение)"""
+        ...
+    def execute_compiled(self, program):
+        ...
+    @classmethod
+    def execute_batch(cls, code, games):
+        ...
+    def get_execution_summary(self):
+        ...
+
+#file: program_runner.py
+class ProgramRunner:
+    """Запуск программы игрока в фоновом потоке с потоком ходов в очередь"""
+    def __init__(self, code, maze, player, queue_size=256, **limits):
+        ...
+    def start(self):
+        ...
+    def cancel(self):
+        ...
+    def poll(self):
+        ...
+
+#file: solver.py
+def distance_to_finish(maze, x, y):
+    ...
+def is_solvable(maze):
+    ...
+def next_best_move(maze, x, y):
+    ...
+def shortest_path(maze, x=None, y=None):
+    ...
+
+#file: maze_file.py
+def save_maze(maze, path):
+    ...
+def load_maze(path):
+    ...
+class LevelPackWriter:
+    def __init__(self, path):
+        ...
+    def add(self, maze):
+        ...
+class LevelPack:
+    """Набор уровней с произвольным доступом LevelPack[i] через mmap"""
+    def __init__(self, path):
+        ...
+
+#file: replay.py
+class Replay:
+    """Повтор: seed лабиринта, старт, ходы по 2 бита и контрольные точки"""
+    def __init__(self, width, height, seed, algorithm, start_pos, codes, step_count,
+                 checkpoints=None, checkpoint_interval=256):
+        ...
+    def position_at(self, step):
+        ...
+    def save(self, path):
+        ...
+    @classmethod
+    def load(cls, path):
+        ...
+
+#file: race.py
+class Race:
+    """Гонка программ на одном лабиринте: ленты попыток и рой агентов"""
+    def __init__(self, maze, programs, max_moves=10000):
+        # programs - словарь {имя участника: код программы}
+        ...
+    def step(self):
+        ...
+    def run(self, ticks=None):
+        ...
+    def get_standings(self):
+        ...
 
 #file: ui.py
 class UI:
@@ -100,7 +247,11 @@ class UI:
     def __init__(self, screen):
         ...
 
-    def draw_maze(self, maze, player):
+    def draw_maze(self, maze, player, swarm=None):
+        ...
+    def draw_minimap(self, maze, player):
+        ...
+    def draw_hud(self, stats=None):
         ...
     def draw_code_panel(self, editing_code=False):
         ...
@@ -110,7 +261,11 @@ class UI:
         ...
     def draw_menu(self):
         ...
-    
+    def scroll_maze(self, dx, dy):
+        ...
+    def zoom_maze(self, steps, screen_pos=None):
+        ...
+
     def get_button_rects(self):
         """Получить прямоугольники кнопок для обработки кликов"""
         ...
@@ -119,7 +274,7 @@ class UI:
     def get_code_text(self):
         ...
     def set_output_text(self, text):
-        ... 
+        ...
     def add_character(self, char):
         ...
     def remove_character(self):
@@ -127,19 +282,18 @@ class UI:
 
 #file: main.py
 class MazeGame:
-    def __init__(self):
+    def __init__(self, headless=False):
         ...
 
     def run(self):
         """Основной цикл игры"""
-        while self.running:
-            self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
-        pygame.quit()
-
-    def handle_events(self):
+        ...
+
+    def run_script(self, actions):
+        """Прогнать сценарий через ту же машину состояний без отрисовки"""
+        ...
+
+    def handle_events(self, events=None):
         """Обработка событий"""
         ...
 
@@ -159,6 +313,12 @@ class MazeGame:
         """Обработка событий при выполнении кода"""
         ...
 
+    def handle_replay_events(self, event):
+        ...
+
+    def handle_race_events(self, event):
+        ...
+
     def update(self):
         """Обновление состояния игры"""
         ...
@@ -171,7 +331,13 @@ class MazeGame:
         """Выполнение пользовательского кода"""
         ...
 
-    def reset_game(self):
+    def start_replay(self, replay):
+        ...
+
+    def start_race(self, programs):
+        ...
+
+    def reset_game(self, seed=None):
         """Сброс игры"""
         ...
 
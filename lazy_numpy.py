@@ -0,0 +1,21 @@
+"""
+Ленивый импорт NumPy
+
+NumPy необязателен, а его импорт долгий, поэтому модули, которым он
+нужен (мини-карта, гонка), берут его через load_numpy() при первой
+надобности и без него работают обычными циклами.
+"""
+
+numpy = None  # Загружается при первом вызове load_numpy
+
+
+def load_numpy():
+    """Импортировать NumPy при первой надобности; None - его нет"""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as numpy_module
+            numpy = numpy_module
+        except ImportError:
+            numpy = False
+    return numpy or None
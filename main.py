@@ -1,56 +1,244 @@
-import pygame
-from colors import Colors, GameState, WINDOW_WIDTH, WINDOW_HEIGHT, FPS
-from colors import DEFAULT_MAZE_WIDTH, DEFAULT_MAZE_HEIGHT
-from maze import Maze
+import argparse
+import json
+import os
+import random
+import time
+from colors import Colors, GameState, WINDOW_WIDTH, WINDOW_HEIGHT, FPS, IDLE_WAIT_MS
+from colors import DEFAULT_MAZE_WIDTH, DEFAULT_MAZE_HEIGHT, MAZE_CACHE_SIZE, MAZE_SEED_RANGE
+from colors import PLAYBACK_SPEED, EXECUTION_QUEUE_SIZE, SCROLL_STEP, REPLAY_PATH
+from colors import RACE_STANDINGS_SIZE
+from frame_profiler import FrameProfiler, HUD_WINDOW, PROFILE_JSON_PATH, PROFILE_TRACE_PATH
+from frame_profiler import PHASE_WAIT, PHASE_EVENTS, PHASE_UPDATE, PHASE_DRAW, PHASE_TICK
+from maze import MazeCache
 from player import Player, CommandInterpreter
-from ui import UI
+from program_runner import ProgramRunner, EVENT_MOVE, EVENT_DONE
+from code_buffer import EditorState
+from replay import Replay, ReplayRecorder, ReplayPlayback
+from race import Race
+
+# pygame и интерфейс загружаются лениво (load_ui): режиму без окна они не нужны
+pygame = None
+UI = None
+
+
+def load_ui():
+    """Импортировать pygame и модуль интерфейса (один раз) и включить только окно и шрифты"""
+    global pygame, UI
+    if UI is None:
+        import pygame as pygame_module
+        from ui import UI as ui_class
+        pygame, UI = pygame_module, ui_class
+    # Звук и джойстики игре не нужны: pygame.init() заняло бы их зря
+    pygame.display.init()
+    pygame.font.init()
+
 
 class MazeGame:
-    def __init__(self):
-        pygame.init()
-        
-        # Создание окна
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Лабиринт с программированием")
+    def __init__(self, headless=False):
+        # Без окна pygame не загружается: сценарий идет через ту же машину
+        # состояний, но с текстовым состоянием интерфейса (EditorState)
+        self.headless = headless
+        if headless:
+            self.screen = None
+            self.clock = None
+        else:
+            load_ui()
+            # Создание окна
+            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            pygame.display.set_caption("Лабиринт с программированием")
+            self.clock = pygame.time.Clock()
         
         # Игровые параметры
-        self.clock = pygame.time.Clock()
         self.running = True
         self.game_state = GameState.MENU
         
         # Создание игровых объектов
-        self.maze = Maze(DEFAULT_MAZE_WIDTH, DEFAULT_MAZE_HEIGHT)
-        self.player = Player(*self.maze.start_pos)
-        self.command_interpreter = CommandInterpreter(self.player, self.maze)
+        self.maze_cache = MazeCache(MAZE_CACHE_SIZE)
+        self.maze = self.maze_cache.get(DEFAULT_MAZE_WIDTH, DEFAULT_MAZE_HEIGHT,
+                                        random.randrange(MAZE_SEED_RANGE))
+        self.last_replay = None  # Повтор прошлой попытки (текущая пишется в player.recorder)
+        self.replay_playback = None
+        self.replay_time = 0.0
+        self.race = None  # Гонка программ на текущем лабиринте (race.Race)
+        self.race_paused = False
+        self.race_speed = PLAYBACK_SPEED  # тактов в секунду
+        self.race_budget = 0.0
+        self.race_time = 0.0
+        self.new_player()
         
         # Интерфейс
-        self.ui = UI(self.screen)
+        self.ui = EditorState() if headless else UI(self.screen)
         self.editing_code = False  # Флаг для редактирования кода
+        self.was_game_screen = False  # Был ли на прошлом кадре игровой экран
+        
+        # Планировщик отрисовки: кадр рисуется только при изменениях
+        self.needs_redraw = True
+        self.frame_count = 0
+        self.wakeup_count = 0
+        
+        # Фоновое выполнение кода и проигрывание ходов
+        self.program_runner = None
+        self.playback_speed = PLAYBACK_SPEED  # ходов в секунду
+        self.playback_budget = 0.0
+        self.playback_time = 0.0
+        self.playback_target = None  # Куда еще идти по клетке после move_*(n)/run_*()
+        
+        # Замер фаз каждого кадра и панель производительности (F3)
+        self.profiler = FrameProfiler()
+        self.show_hud = False
 
     def run(self):
         """Основной цикл игры"""
+        profiler = self.profiler
         while self.running:
-            self.handle_events()
+            profiler.begin_frame()
+            events = self.wait_events()
+            profiler.end_phase(PHASE_WAIT)
+            self.handle_events(events)
+            profiler.end_phase(PHASE_EVENTS)
             self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            profiler.end_phase(PHASE_UPDATE)
+            # С открытой панелью кадр рисуется на каждом пробуждении, чтобы цифры обновлялись
+            if self.needs_redraw or self.is_animating() or self.show_hud:
+                self.draw()
+                self.needs_redraw = False
+                self.frame_count += 1
+            profiler.end_phase(PHASE_DRAW)
+            if self.is_animating():
+                self.clock.tick(FPS)
+            profiler.end_phase(PHASE_TICK)
+            profiler.end_frame()
+        self.cancel_program()
         pygame.quit()
 
-    def handle_events(self):
+    def run_script(self, actions):
+        """Прогнать сценарий через ту же машину состояний без отрисовки.
+
+        actions - список действий:
+            ("code", "move_right()")  - ввести код и нажать "Выполнить"
+            ("reset",)                - начать текущий уровень заново
+            ("new_maze",) или ("new_maze", seed) - новый лабиринт
+            ("save_replay", path)     - сохранить повтор текущей попытки
+            ("replay", path)          - открыть повтор и перемотать в конец
+            ("race", {имя: код})      - гонка программ на текущем лабиринте до конца
+        Возвращает список результатов, по одному на действие.
+        """
+        results = []
+        self.game_state = GameState.PLAYING
+        for action in actions:
+            kind = action[0]
+            # Игровые действия продолжают игру: открытый повтор или гонка закрываются
+            if kind in ("code", "reset", "new_maze"):
+                if self.game_state == GameState.REPLAY:
+                    self.stop_replay()
+                elif self.game_state == GameState.RACE:
+                    self.stop_race()
+            if kind == "code":
+                self.ui.set_code_text(action[1])
+                self.execute_code()
+            elif kind == "reset":
+                self.reset_game(self.maze.seed)
+            elif kind == "new_maze":
+                self.reset_game(action[1] if len(action) > 1 else None)
+            elif kind == "save_replay":
+                self.save_replay(action[1])
+            elif kind == "replay":
+                self.start_replay(Replay.load(action[1]))
+                self.replay_playback.seek(len(self.replay_playback.replay))
+                self.show_replay_step()
+            elif kind == "race":
+                self.start_race(action[1])
+                self.race.run()
+                self.show_race_step()
+            else:
+                raise ValueError(f"Неизвестное действие сценария: {kind}")
+            self.update()
+            
+            results.append({
+                'action': kind,
+                'seed': self.maze.seed,
+                'state': self.game_state.name,
+                'position': self.player.get_position(),
+                'moves': self.player.moves_count,
+                'output': self.ui.output_text
+            })
+        return results
+
+    def is_animating(self):
+        """Есть ли на экране что-то движущееся (тогда рисуем с полной частотой)"""
+        if self.game_state == GameState.REPLAY:
+            return not (self.replay_playback.paused or self.replay_playback.is_finished())
+        if self.game_state == GameState.RACE:
+            return not (self.race_paused or self.race.is_finished())
+        return self.game_state == GameState.EXECUTING
+
+    def wait_events(self):
+        """Получить события: во время анимации - без ожидания, в простое - блокируясь"""
+        self.wakeup_count += 1
+        if self.is_animating():
+            return pygame.event.get()
+        
+        # В простое спим до прихода события (не дольше IDLE_WAIT_MS)
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def request_redraw(self, full=False):
+        """Запросить перерисовку на ближайшей итерации цикла"""
+        self.needs_redraw = True
+        if full:
+            self.was_game_screen = False
+
+    def get_loop_stats(self):
+        """Счетчики цикла: отрисованные кадры и пробуждения"""
+        return {
+            'frames': self.frame_count,
+            'wakeups': self.wakeup_count
+        }
+
+    def handle_events(self, events=None):
         """Обработка событий"""
-        for event in pygame.event.get():
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.show_hud = not self.show_hud
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.export_profile()
+            
+            # Движение мыши ничего не меняет на экране
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.request_redraw(full=True)
+            elif event.type != pygame.MOUSEMOTION:
+                self.request_redraw()
             
             # Обработка клавиш в зависимости от состояния игры
             if self.game_state == GameState.MENU:
                 self.handle_menu_events(event)
             elif self.game_state == GameState.PLAYING:
                 self.handle_playing_events(event)
+                self.handle_view_events(event)
             elif self.game_state == GameState.EDITING_CODE:
                 self.handle_editing_code_events(event)
             elif self.game_state == GameState.EXECUTING:
                 self.handle_executing_events(event)
+                self.handle_view_events(event)
+            elif self.game_state == GameState.REPLAY:
+                self.handle_replay_events(event)
+            elif self.game_state == GameState.RACE:
+                self.handle_race_events(event)
+                self.handle_view_events(event)
+            elif self.game_state == GameState.GAME_OVER:
+                self.handle_game_over_events(event)
+
+    def export_profile(self, json_path=PROFILE_JSON_PATH, trace_path=PROFILE_TRACE_PATH):
+        """Выгрузить последние кадры в JSON и в Chrome Trace"""
+        frames = self.profiler.export_json(json_path)
+        self.profiler.export_chrome_trace(trace_path)
+        self.ui.set_output_text(f"Выгружено кадров: {frames}\n{json_path}\n{trace_path}")
 
     def handle_menu_events(self, event):
         """Обработка событий в меню"""
@@ -68,6 +256,12 @@ class MazeGame:
                 self.editing_code = True  # Устанавливаем оба флага
             elif event.key == pygame.K_r and not self.editing_code:
                 self.reset_game()
+            elif event.key == pygame.K_F5:
+                self.save_replay()
+            elif event.key == pygame.K_F6:
+                replay = self.get_replay()
+                if replay is not None:
+                    self.start_replay(replay)
     
         if event.type == pygame.MOUSEBUTTONDOWN:
             mouse_pos = pygame.mouse.get_pos()
@@ -93,6 +287,11 @@ class MazeGame:
                 self.ui.remove_character()
             elif event.key == pygame.K_RETURN:
                 self.ui.add_character("\n")
+            elif event.key == pygame.K_DELETE:
+                self.ui.delete_character()
+            elif event.key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN,
+                               pygame.K_HOME, pygame.K_END):
+                self.ui.move_cursor(event.key)
             else:
                 # Добавляем проверку на пустой unicode
                 if event.unicode and event.unicode.isprintable():
@@ -111,55 +310,346 @@ class MazeGame:
             elif button_rects['code_area'].collidepoint(mouse_pos):
                 self.editing_code = True
 
+    def handle_view_events(self, event):
+        """Прокрутка и масштаб лабиринта: стрелки, +/-, колесо мыши, C - к игроку"""
+        if event.type == pygame.MOUSEWHEEL:
+            self.ui.zoom_maze(event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.KEYDOWN and not self.editing_code:
+            scroll = {
+                pygame.K_LEFT: (-SCROLL_STEP, 0),
+                pygame.K_RIGHT: (SCROLL_STEP, 0),
+                pygame.K_UP: (0, -SCROLL_STEP),
+                pygame.K_DOWN: (0, SCROLL_STEP),
+            }
+            if event.key in scroll:
+                self.ui.scroll_maze(*scroll[event.key])
+            elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                self.ui.zoom_maze(1)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.ui.zoom_maze(-1)
+            elif event.key == pygame.K_c:
+                self.ui.follow_player(self.player)
+
     def handle_executing_events(self, event):
         """Обработка событий при выполнении кода"""
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
+                self.cancel_program()
+                self.ui.set_output_text("Выполнение остановлено.")
                 self.game_state = GameState.PLAYING
 
+    def handle_game_over_events(self, event):
+        """Обработка событий на экране победы"""
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F6:
+            replay = self.get_replay()
+            if replay is not None:
+                self.start_replay(replay)
+
+    def handle_replay_events(self, event):
+        """Управление просмотром повтора"""
+        if event.type != pygame.KEYDOWN:
+            return
+        playback = self.replay_playback
+        total = len(playback.replay)
+        step = playback.get_step()
+        if event.key == pygame.K_ESCAPE:
+            self.stop_replay()
+            return
+        if event.key == pygame.K_SPACE:
+            playback.paused = not playback.paused
+            self.replay_time = time.perf_counter()
+        elif event.key == pygame.K_LEFT:
+            playback.seek(step - 1)
+        elif event.key == pygame.K_RIGHT:
+            playback.seek(step + 1)
+        elif event.key == pygame.K_DOWN:
+            playback.seek(step - max(1, total // 10))
+        elif event.key == pygame.K_UP:
+            playback.seek(step + max(1, total // 10))
+        elif event.key == pygame.K_HOME:
+            playback.seek(0)
+        elif event.key == pygame.K_END:
+            playback.seek(total)
+        elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+            playback.speed *= 2
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            playback.speed = max(1.0, playback.speed / 2)
+        self.show_replay_step()
+
+    def handle_race_events(self, event):
+        """Управление гонкой программ"""
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == pygame.K_ESCAPE:
+            self.stop_race()
+            return
+        if event.key == pygame.K_SPACE:
+            self.race_paused = not self.race_paused
+            self.race_time = time.perf_counter()
+        elif event.key == pygame.K_END:
+            self.race.run()
+        elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+            self.race_speed *= 2
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.race_speed = max(1.0, self.race_speed / 2)
+        else:
+            return
+        self.show_race_step()
+
     def update(self):
         """Обновление состояния игры"""
+        if self.game_state == GameState.EXECUTING:
+            self.play_program_events()
+        
+        if self.game_state == GameState.REPLAY:
+            now = time.perf_counter()
+            if self.replay_playback.advance(now - self.replay_time):
+                self.show_replay_step()
+            self.replay_time = now
+        
+        if self.game_state == GameState.RACE:
+            now = time.perf_counter()
+            if not self.race_paused:
+                # Целое число тактов за прошедшее время, остаток копится
+                self.race_budget += (now - self.race_time) * self.race_speed
+                ticks = int(self.race_budget)
+                self.race_budget -= ticks
+                if ticks and self.race.run(ticks):
+                    self.show_race_step()
+            self.race_time = now
+        
         if self.game_state == GameState.PLAYING:
             if self.player.is_at_finish(self.maze.finish_pos):
                 self.game_state = GameState.GAME_OVER
+                self.request_redraw()
 
     def draw(self):
         """Отрисовка элементов игры"""
-        self.screen.fill(Colors.WHITE)
+        game_screen = self.game_state in [GameState.PLAYING, GameState.EDITING_CODE,
+                                          GameState.EXECUTING, GameState.REPLAY, GameState.RACE]
         
-        if self.game_state == GameState.MENU:
-            self.ui.draw_menu()
-        elif self.game_state in [GameState.PLAYING, GameState.EDITING_CODE]:
-            self.ui.draw_maze(self.maze, self.player)
-            self.ui.draw_code_panel(editing_code=self.editing_code)
-            self.ui.draw_buttons()
-            self.ui.draw_hints()
-        elif self.game_state == GameState.GAME_OVER:
-            self.draw_game_over_screen()
-
-        pygame.display.flip()
+        if not game_screen:
+            # Меню и экран победы рисуются целиком
+            self.screen.fill(Colors.WHITE)
+            if self.game_state == GameState.MENU:
+                self.ui.draw_menu()
+            elif self.game_state == GameState.GAME_OVER:
+                self.draw_game_over_screen()
+            pygame.display.flip()
+            self.was_game_screen = False
+            return
+        
+        # Игровой экран: после смены экрана - полная перерисовка,
+        # дальше обновляются только измененные прямоугольники
+        full_redraw = not self.was_game_screen
+        if full_redraw:
+            self.screen.fill(Colors.WHITE)
+            self.ui.invalidate_maze()
+        
+        swarm = self.race.swarm if self.game_state == GameState.RACE else None
+        dirty_rects = self.ui.draw_maze(self.maze, self.player, swarm)
+        dirty_rects.append(self.ui.draw_minimap(self.maze, self.player))
+        hud_stats = self.profiler.get_stats(HUD_WINDOW) if self.show_hud else None
+        dirty_rects.append(self.ui.draw_hud(hud_stats))
+        self.ui.draw_code_panel(editing_code=self.editing_code)
+        self.ui.draw_buttons()
+        self.ui.draw_hints()
+        dirty_rects.append(self.ui.get_side_panel_rect())
+        
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+        self.was_game_screen = True
 
     def execute_code(self):
         """Выполнение пользовательского кода"""
         code = self.ui.get_code_text()
+        
+        if not self.headless:
+            # В окне код выполняется в фоне, а ходы проигрываются анимацией
+            self.start_program(code)
+            return
     
-        # Используем интерпретатор команд вместо прямого exec
+        # Без окна - синхронно, с максимальной скоростью
         success, message = self.command_interpreter.execute_code(code)
-    
-        if success:
-            self.ui.set_output_text(message)
-            # Проверяем, достиг ли игрок финиша
-        if self.player.is_at_finish(self.maze.finish_pos):
-            self.game_state = GameState.GAME_OVER
-        else:
-            self.ui.set_output_text(message)
-    
+        self.ui.set_output_text(message)
+        self.game_state = GameState.PLAYING
+
+    def start_program(self, code):
+        """Запустить код игрока в фоновом потоке"""
+        self.cancel_program()
+        self.program_runner = ProgramRunner(code, self.maze, self.player,
+                                            EXECUTION_QUEUE_SIZE).start()
+        self.playback_budget = 0.0
+        self.playback_time = time.perf_counter()
+        self.playback_target = None
+        if not self.headless:
+            self.ui.follow_player(self.player)
+        self.ui.set_output_text("Выполняется...\nESC - остановить")
+        self.game_state = GameState.EXECUTING
+
+    def cancel_program(self):
+        """Остановить фоновое выполнение, если оно идет"""
+        if self.program_runner:
+            self.program_runner.cancel()
+            self.program_runner = None
+
+    def play_program_events(self):
+        """Забрать из очереди ходы, положенные по скорости проигрывания"""
+        now = time.perf_counter()
+        self.playback_budget += (now - self.playback_time) * self.playback_speed
+        self.playback_time = now
+        
+        while self.playback_budget >= 1:
+            if self.playback_target:
+                self.step_towards_target()
+                continue
+            
+            event = self.program_runner.poll()
+            if event is None:
+                # Программа еще думает - не копим ходы для рывка
+                self.playback_budget = 1.0
+                return
+            
+            if event[0] == EVENT_MOVE:
+                _, command, success, position = event
+                if position != self.player.get_position():
+                    # Прыжок на несколько клеток показываем по одной клетке
+                    self.playback_target = position
+            elif event[0] == EVENT_DONE:
+                _, success, message = event
+                self.program_runner = None
+                self.ui.set_output_text(message)
+                self.game_state = GameState.PLAYING
+                self.request_redraw()
+                return
+
+    def step_towards_target(self):
+        """Сдвинуть игрока на одну клетку к playback_target"""
+        x, y = self.player.get_position()
+        target_x, target_y = self.playback_target
+        x += (target_x > x) - (target_x < x)
+        y += (target_y > y) - (target_y < y)
+        self.player.move_to(x, y)
+        self.playback_budget -= 1
+        if (x, y) == self.playback_target:
+            self.playback_target = None
+
+    def new_player(self):
+        """Новый игрок на старте текущего лабиринта, с записью повтора"""
+        start = self.maze.start_pos
+        self.player = Player(*start, recorder=ReplayRecorder(self.maze, start))
+        self.command_interpreter = CommandInterpreter(self.player, self.maze)
+
+    def get_replay(self):
+        """Повтор текущей попытки, а если в ней еще нет ходов - прошлой"""
+        recorder = self.player.recorder
+        if recorder is not None and len(recorder):
+            return recorder.to_replay()
+        return self.last_replay
+
+    def save_replay(self, path=REPLAY_PATH):
+        """Сохранить повтор в файл"""
+        replay = self.get_replay()
+        if replay is None:
+            self.ui.set_output_text("Повтор пуст: еще не было ни одного хода.")
+            return None
+        replay.save(path)
+        self.ui.set_output_text(f"Повтор сохранен: {path}\nШагов: {len(replay)}")
+        return path
+
+    def start_replay(self, replay):
+        """Открыть повтор: лабиринт строится по seed, код игрока не выполняется"""
+        self.cancel_program()
+        if self.player.recorder is not None and len(self.player.recorder):
+            self.last_replay = self.player.recorder.to_replay()
+        self.maze = self.maze_cache.get(replay.width, replay.height, replay.seed, replay.algorithm)
+        self.player = Player(*replay.start_pos)
+        self.command_interpreter = CommandInterpreter(self.player, self.maze)
+        self.replay_playback = ReplayPlayback(replay, self.playback_speed)
+        self.replay_time = time.perf_counter()
+        self.game_state = GameState.REPLAY
+        self.show_replay_step()
+
+    def show_replay_step(self):
+        """Поставить игрока на текущий шаг повтора и показать, где мы"""
+        playback = self.replay_playback
+        self.player.x, self.player.y = playback.get_position()
+        self.player.moves_count = playback.get_step()
+        self.ui.set_output_text(
+            f"Повтор: шаг {playback.get_step()} из {len(playback.replay)}\n"
+            f"Скорость: {playback.speed:g} шагов/с{' (пауза)' if playback.paused else ''}\n"
+            "Пробел - пауза, ←/→ - шаг, ↓/↑ - 10%\n"
+            "Home/End - начало/конец, +/- - скорость\n"
+            "ESC - выйти из повтора"
+        )
+
+    def stop_replay(self):
+        """Выйти из повтора на тот же уровень"""
+        self.replay_playback = None
+        self.new_player()
+        self.ui.set_output_text("Повтор закрыт.")
         self.game_state = GameState.PLAYING
 
-    def reset_game(self):
-        """Сброс игры"""
-        self.maze = Maze(DEFAULT_MAZE_WIDTH, DEFAULT_MAZE_HEIGHT)
+    def start_race(self, programs):
+        """Гонка программ ({имя: код}) на текущем лабиринте.
+
+        Программы выполняются сразу (по разу на разный код), а такты гонки
+        проигрываются для всех агентов вместе.
+        """
+        self.cancel_program()
+        self.race = Race(self.maze, programs)
         self.player = Player(*self.maze.start_pos)
+        self.command_interpreter = CommandInterpreter(self.player, self.maze)
+        self.race_paused = False
+        self.race_budget = 0.0
+        self.race_time = time.perf_counter()
+        self.game_state = GameState.RACE
+        if not self.headless:
+            self.ui.follow_player(self.player)
+        self.show_race_step()
+
+    def show_race_step(self):
+        """Поставить игрока на место лидера и показать таблицу гонки"""
+        race = self.race
+        standings = race.get_standings()
+        leader = standings[0]
+        self.player.x, self.player.y = leader['position']
+        self.player.moves_count = leader['moves']
+
+        lines = [f"Гонка: такт {race.get_tick()} из {race.duration}, "
+                 f"на финише {race.swarm.finished_count()} из {len(race)}"]
+        for place, row in enumerate(standings[:RACE_STANDINGS_SIZE], 1):
+            if row['finish_tick'] is not None:
+                result = f"финиш на такте {row['finish_tick']}"
+            elif row['error']:
+                result = f"{row['position']}, ошибка"
+            else:
+                result = f"{row['position']}, ходов {row['moves']}"
+            lines.append(f"{place}. {row['name']}: {result}")
+        if len(standings) > RACE_STANDINGS_SIZE:
+            lines.append(f"... и еще {len(standings) - RACE_STANDINGS_SIZE}")
+        lines.append(f"Скорость: {self.race_speed:g} тактов/с{' (пауза)' if self.race_paused else ''}")
+        lines.append("Пробел - пауза, End - до конца, +/- - скорость, ESC - выйти")
+        self.ui.set_output_text("\n".join(lines))
+
+    def stop_race(self):
+        """Закончить гонку и вернуться к игре на том же лабиринте"""
+        self.race = None
+        self.new_player()
+        self.ui.set_output_text("Гонка закончена.")
+        self.game_state = GameState.PLAYING
+
+    def reset_game(self, seed=None):
+        """Сброс игры (seed задает уровень, без него - новый случайный)"""
+        self.cancel_program()
+        if self.player.recorder is not None and len(self.player.recorder):
+            self.last_replay = self.player.recorder.to_replay()
+        if seed is None:
+            seed = random.randrange(MAZE_SEED_RANGE)
+        self.maze = self.maze_cache.get(DEFAULT_MAZE_WIDTH, DEFAULT_MAZE_HEIGHT, seed)
+        self.new_player()
         self.ui.set_code_text("")
         self.ui.set_output_text("Игра сброшена!")
         self.game_state = GameState.PLAYING
@@ -167,7 +657,7 @@ class MazeGame:
     def draw_game_over_screen(self):
         """Экран завершения игры"""
         self.screen.fill(Colors.DARK_GRAY)
-        title = self.ui.font_large.render("ПОБЕДА!", True, Colors.GREEN)
+        title = self.ui.render_text(self.ui.font_large, "ПОБЕДА!", Colors.GREEN)
         title_rect = title.get_rect(center=(WINDOW_WIDTH // 2, 200))
         self.screen.blit(title, title_rect)
         
@@ -175,15 +665,61 @@ class MazeGame:
             "Вы успешно прошли лабиринт!",
             "",
             "Нажмите F1 для выхода в меню",
-            "или ESC для выхода из игры."
+            "или ESC для выхода из игры.",
+            "F6 - посмотреть повтор прохождения"
         ]
         
         for i, line in enumerate(description):
-            text = self.ui.font_medium.render(line, True, Colors.WHITE)
+            text = self.ui.render_text(self.ui.font_medium, line, Colors.WHITE)
             text_rect = text.get_rect(center=(WINDOW_WIDTH // 2, 300 + i * 30))
             self.screen.blit(text, text_rect)
 
+def load_programs(paths):
+    """Программы участников гонки из файлов: {имя файла без расширения: код}"""
+    programs = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as program_file:
+            programs[os.path.splitext(os.path.basename(path))[0]] = program_file.read()
+    return programs
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Лабиринт с программированием")
+    parser.add_argument("--headless", metavar="SCRIPT",
+                        help="прогнать сценарий (JSON-список действий) без окна и вывести результаты")
+    parser.add_argument("--seed", type=int, help="seed первого лабиринта (в сценарии и в гонке)")
+    parser.add_argument("-o", "--output", help="файл для результатов сценария (по умолчанию stdout)")
+    parser.add_argument("--replay", metavar="FILE", help="открыть игру на просмотре повтора")
+    parser.add_argument("--race", metavar="FILE", nargs="+",
+                        help="гонка программ из файлов (имя участника - имя файла)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="при выходе выгрузить последние кадры в Chrome Trace")
+    return parser.parse_args(argv)
+
+
 # Запуск игры
 if __name__ == "__main__":
-    game = MazeGame()
-    game.run()
\ No newline at end of file
+    args = parse_args()
+    if args.headless:
+        with open(args.headless, encoding="utf-8") as script_file:
+            script = json.load(script_file)
+        game = MazeGame(headless=True)
+        if args.seed is not None:
+            game.reset_game(args.seed)
+        report = json.dumps(game.run_script(script), ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output_file:
+                output_file.write(report)
+        else:
+            print(report)
+    else:
+        game = MazeGame()
+        if args.replay:
+            game.start_replay(Replay.load(args.replay))
+        elif args.race:
+            game.reset_game(args.seed)
+            game.start_race(load_programs(args.race))
+        game.run()
+        if args.trace:
+            game.profiler.export_chrome_trace(args.trace)
\ No newline at end of file
@@ -3,30 +3,187 @@
 """
 
 import random
-from colors import CellType
+from array import array
+from collections import OrderedDict
+from colors import CellType, DIRECTION_DELTAS
+
+# Коды клеток в компактной сетке (один байт на клетку)
+WALL_CODE = CellType.WALL.value
+PATH_CODE = CellType.PATH.value
+START_CODE = CellType.START.value
+FINISH_CODE = CellType.FINISH.value
+
+# Таблица "код -> CellType" и таблица проходимости по коду клетки
+# (256 байт, чтобы ее можно было передавать в bytes.translate)
+CELL_TYPES_BY_CODE = tuple(CellType)
+WALKABLE_CODES = bytes(1 if code in (PATH_CODE, START_CODE, FINISH_CODE) else 0 for code in range(256))
+
+# Потолок счетчика свободных клеток (array 'H'); длинные пробежки досчитываются
+MAX_FREE_RUN = 0xFFFF
+
+# Алгоритмы генерации
+ALGORITHM_BACKTRACKING = "backtracking"
+ALGORITHM_ELLER = "eller"
+ALGORITHMS = (ALGORITHM_BACKTRACKING, ALGORITHM_ELLER)
+
+
+def iter_eller_rows(width, height, rng=None):
+    """Потоковая генерация лабиринта алгоритмом Эллера.
+
+    Возвращает строки сетки (bytearray длиной width) сверху вниз. Память
+    пропорциональна ширине, поэтому очень высокие лабиринты можно писать
+    на диск или на экран по мере генерации. Старт (1, 1) и финиш
+    (width - 2, height - 2) отмечены так же, как в Maze.
+    """
+    rng = rng or random.Random()
+    cols = (width - 1) // 2
+    rows = (height - 1) // 2
+    finish_x, finish_y = width - 2, height - 2
+
+    def mark(row, y):
+        # Отметить старт и финиш, если они попадают в эту строку
+        if y == 1 and width > 1:
+            row[1] = START_CODE
+        if y == finish_y and 0 <= finish_x < width:
+            row[finish_x] = FINISH_CODE
+        return row
+
+    # Верхняя граница
+    yield bytearray(width)
+    y = 1
+
+    sets = [None] * cols  # Номер множества для каждой клетки текущей строки
+    members = {}  # Номер множества -> столбцы этого множества
+    next_set = 0
+
+    for r in range(rows):
+        last = r == rows - 1
+
+        # Клетки без множества получают новое множество
+        for c in range(cols):
+            if sets[c] is None:
+                sets[c] = next_set
+                members[next_set] = [c]
+                next_set += 1
+
+        # Горизонтальные проходы: в последней строке объединяем всё
+        cell_row = bytearray(width)
+        for c in range(cols):
+            cell_row[2 * c + 1] = PATH_CODE
+            if c + 1 < cols and sets[c] != sets[c + 1] and (last or rng.random() < 0.5):
+                cell_row[2 * c + 2] = PATH_CODE
+                keep, gone = sets[c], sets[c + 1]
+                # Переименовываем меньшее множество в большее
+                if len(members[keep]) < len(members[gone]):
+                    keep, gone = gone, keep
+                for col in members[gone]:
+                    sets[col] = keep
+                members[keep].extend(members.pop(gone))
+        yield mark(cell_row, y)
+        y += 1
+
+        if last:
+            break
+
+        # Вертикальные проходы: хотя бы один из каждого множества
+        down_row = bytearray(width)
+        next_sets = [None] * cols
+        next_members = {}
+        for set_id, cols_in_set in members.items():
+            down = [col for col in cols_in_set if rng.random() < 0.5]
+            if not down:
+                down = [rng.choice(cols_in_set)]
+            for col in down:
+                down_row[2 * col + 1] = PATH_CODE
+                next_sets[col] = set_id
+            next_members[set_id] = down
+        sets, members = next_sets, next_members
+        yield mark(down_row, y)
+        y += 1
+
+    # Нижняя граница (и лишние строки при четной высоте)
+    while y < height:
+        yield mark(bytearray(width), y)
+        y += 1
+
 
 class Maze:
     """Класс для генерации и управления лабиринтом"""
     
-    def __init__(self, width=13, height=9):
+    def __init__(self, width=13, height=9, algorithm=ALGORITHM_BACKTRACKING, seed=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Неизвестный алгоритм генерации: {algorithm}")
         self.width = width  # Должно быть нечетным для правильной генерации
         self.height = height  # Должно быть нечетным для правильной генерации
-        self.grid = []
+        self.cells = bytearray(width * height)  # Компактная сетка: один байт на клетку
         self.start_pos = (1, 1)
         self.finish_pos = (width - 2, height - 2)
+        self.algorithm = algorithm
+        self.seed = seed  # Одинаковые (width, height, seed, algorithm) дают одинаковую сетку
+        self.rng = random.Random(seed)  # Собственный генератор, глобальный random не трогаем
         self.generate_maze()
     
+    @classmethod
+    def from_cells(cls, width, height, cells, start_pos=(1, 1), finish_pos=None,
+                   algorithm=ALGORITHM_BACKTRACKING, seed=None):
+        """Создать лабиринт из готовой компактной сетки без генерации"""
+        maze = cls.__new__(cls)
+        maze.width = width
+        maze.height = height
+        maze.cells = bytearray(cells)
+        maze.start_pos = tuple(start_pos)
+        maze.finish_pos = tuple(finish_pos) if finish_pos else (width - 2, height - 2)
+        maze.algorithm = algorithm
+        maze.seed = seed
+        maze.rng = random.Random(seed)
+        maze.invalidate_caches()
+        return maze
+    
+    def save(self, path):
+        """Сохранить лабиринт в бинарный файл (см. maze_file)"""
+        from maze_file import save_maze
+        save_maze(self, path)
+    
+    @classmethod
+    def load(cls, path):
+        """Загрузить лабиринт из бинарного файла (см. maze_file)"""
+        from maze_file import load_maze
+        return load_maze(path)
+    
+    @property
+    def grid(self):
+        """Сетка в виде списка строк из CellType (медленно, только для совместимости)"""
+        width = self.width
+        return [[CELL_TYPES_BY_CODE[code] for code in self.cells[y * width:(y + 1) * width]]
+                for y in range(self.height)]
+    
     def generate_maze(self):
+        """Генерация лабиринта выбранным алгоритмом"""
+        self.invalidate_caches()
+        if self.algorithm == ALGORITHM_ELLER:
+            self.generate_eller()
+        else:
+            self.generate_backtracking()
+        
+        # Убедиться что финиш доступен
+        self.ensure_finish_accessible()
+    
+    def generate_eller(self):
+        """Генерация лабиринта алгоритмом Эллера (строка за строкой)"""
+        self.cells = bytearray().join(iter_eller_rows(self.width, self.height, self.rng))
+    
+    def generate_backtracking(self):
         """Генерация лабиринта алгоритмом рекурсивного backtracking"""
+        width = self.width
         # Инициализация: все стены
-        self.grid = [[CellType.WALL for _ in range(self.width)] for _ in range(self.height)]
+        cells = self.cells = bytearray(width * self.height)
         
         # Стек для backtracking
         stack = []
         
         # Начальная позиция
         start_x, start_y = 1, 1
-        self.grid[start_y][start_x] = CellType.PATH
+        cells[start_y * width + start_x] = PATH_CODE
         stack.append((start_x, start_y))
         
         # Направления движения (право, низ, лево, верх)
@@ -41,19 +198,19 @@ class Maze:
                 next_x, next_y = current_x + dx, current_y + dy
                 
                 # Проверить границы и что клетка еще стена
-                if (1 <= next_x < self.width - 1 and 
+                if (1 <= next_x < width - 1 and 
                     1 <= next_y < self.height - 1 and 
-                    self.grid[next_y][next_x] == CellType.WALL):
+                    cells[next_y * width + next_x] == WALL_CODE):
                     available_dirs.append((dx, dy))
             
             if available_dirs:
                 # Выбрать случайное направление
-                dx, dy = random.choice(available_dirs)
+                dx, dy = self.rng.choice(available_dirs)
                 next_x, next_y = current_x + dx, current_y + dy
                 
                 # Создать проход
-                self.grid[current_y + dy // 2][current_x + dx // 2] = CellType.PATH
-                self.grid[next_y][next_x] = CellType.PATH
+                cells[(current_y + dy // 2) * width + current_x + dx // 2] = PATH_CODE
+                cells[next_y * width + next_x] = PATH_CODE
                 
                 # Добавить новую позицию в стек
                 stack.append((next_x, next_y))
@@ -62,11 +219,8 @@ class Maze:
                 stack.pop()
         
         # Установить старт и финиш
-        self.grid[self.start_pos[1]][self.start_pos[0]] = CellType.START
-        self.grid[self.finish_pos[1]][self.finish_pos[0]] = CellType.FINISH
-        
-        # Убедиться что финиш доступен
-        self.ensure_finish_accessible()
+        self.set_cell_type(*self.start_pos, CellType.START)
+        self.set_cell_type(*self.finish_pos, CellType.FINISH)
     
     def ensure_finish_accessible(self):
         """Убедиться что финиш доступен"""
@@ -78,8 +232,7 @@ class Maze:
         has_path = False
         
         for nx, ny in neighbors:
-            if (0 <= nx < self.width and 0 <= ny < self.height and 
-                self.grid[ny][nx] in [CellType.PATH, CellType.START]):
+            if self.get_cell_code(nx, ny) in (PATH_CODE, START_CODE):
                 has_path = True
                 break
         
@@ -87,22 +240,82 @@ class Maze:
         if not has_path:
             # Создаем путь от предпоследней клетки
             if fx > 1:
-                self.grid[fy][fx-1] = CellType.PATH
+                self.set_cell_type(fx - 1, fy, CellType.PATH)
+    
+    def invalidate_caches(self):
+        """Сбросить данные, вычисленные по сетке"""
+        self.distance_field = None  # Поле расстояний до финиша (см. solver)
+        self.graph_index = None  # Граф коридоров и развилок (см. maze_graph)
+        self.free_runs = None  # Свободные клетки подряд в каждом направлении
+    
+    def get_cell_code(self, x, y):
+        """Получить код клетки (значение CellType) из компактной сетки"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return WALL_CODE
     
     def get_cell_type(self, x, y):
         """Получить тип клетки"""
-        if 0 <= x < self.width and 0 <= y < self.height:
-            return self.grid[y][x]
-        return CellType.WALL
+        return CELL_TYPES_BY_CODE[self.get_cell_code(x, y)]
+    
+    def set_cell_type(self, x, y, cell_type):
+        """Установить тип клетки"""
+        self.cells[y * self.width + x] = cell_type.value
+        self.invalidate_caches()  # Сетка изменилась - производные данные устарели
+    
+    def get_grid_buffer(self):
+        """Получить всю сетку как буфер байтов (строка за строкой, width * height)"""
+        return memoryview(self.cells)
     
     def is_valid_move(self, x, y):
         """Проверить можно ли двигаться в клетку"""
-        cell_type = self.get_cell_type(x, y)
-        return cell_type in [CellType.PATH, CellType.START, CellType.FINISH]
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return WALKABLE_CODES[self.cells[y * self.width + x]] == 1
+        return False
+    
+    def build_free_runs(self):
+        """Для каждой клетки посчитать, сколько свободных клеток подряд в каждом направлении"""
+        width, height = self.width, self.height
+        walkable = bytes(self.cells).translate(WALKABLE_CODES)
+        runs = [array('H', bytes(2 * width * height)) for _ in DIRECTION_DELTAS]
+        up, down, left, right = runs
+        
+        for y in range(height):
+            row = y * width
+            for x in range(1, width):
+                if walkable[row + x - 1]:
+                    left[row + x] = min(left[row + x - 1] + 1, MAX_FREE_RUN)
+            for x in range(width - 2, -1, -1):
+                if walkable[row + x + 1]:
+                    right[row + x] = min(right[row + x + 1] + 1, MAX_FREE_RUN)
+        
+        for index in range(width, width * height):
+            if walkable[index - width]:
+                up[index] = min(up[index - width] + 1, MAX_FREE_RUN)
+        for index in range(width * (height - 1) - 1, -1, -1):
+            if walkable[index + width]:
+                down[index] = min(down[index + width] + 1, MAX_FREE_RUN)
+        
+        self.free_runs = runs
+    
+    def get_free_run(self, x, y, direction):
+        """Сколько свободных клеток подряд от (x, y) в направлении direction (0-3)"""
+        if self.free_runs is None:
+            self.build_free_runs()
+        runs = self.free_runs[direction]
+        dx, dy = DIRECTION_DELTAS[direction]
+        total = 0
+        while True:
+            run = runs[y * self.width + x]
+            total += run
+            if run < MAX_FREE_RUN:
+                return total
+            # Упираемся в потолок счетчика - продолжаем с дальней клетки
+            x, y = x + dx * run, y + dy * run
     
     def is_finish(self, x, y):
         """Проверить является ли клетка финишем"""
-        return self.get_cell_type(x, y) == CellType.FINISH
+        return self.get_cell_code(x, y) == FINISH_CODE
     
     def get_maze_info(self):
         """Получить информацию о лабиринте"""
@@ -112,3 +325,49 @@ class Maze:
             'start': self.start_pos,
             'finish': self.finish_pos
         }
+
+
+class MazeCache:
+    """Ограниченный LRU-кэш сгенерированных лабиринтов"""
+    
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.mazes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, width, height, seed, algorithm=ALGORITHM_BACKTRACKING):
+        """Получить лабиринт из кэша или сгенерировать новый"""
+        # Без seed лабиринт не воспроизводим - не кэшируем
+        if seed is None:
+            self.misses += 1
+            return Maze(width, height, algorithm, seed)
+        
+        key = (width, height, seed, algorithm)
+        maze = self.mazes.get(key)
+        if maze is not None:
+            self.hits += 1
+            self.mazes.move_to_end(key)
+            return maze
+        
+        self.misses += 1
+        maze = Maze(width, height, algorithm, seed)
+        self.mazes[key] = maze
+        if len(self.mazes) > self.max_size:
+            self.mazes.popitem(last=False)
+        return maze
+    
+    def clear(self):
+        """Очистить кэш и счетчики"""
+        self.mazes.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_stats(self):
+        """Получить статистику кэша"""
+        return {
+            'size': len(self.mazes),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
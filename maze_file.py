@@ -0,0 +1,227 @@
+"""
+Бинарный формат файлов лабиринтов и наборов уровней
+
+Запись лабиринта (версия 1, little-endian):
+    magic     4s  b"LBRM"
+    version   H
+    algorithm B   индекс в maze.ALGORITHMS
+    flags     B   бит 0 - seed сохранен
+    width     I
+    height    I
+    seed      Q
+    start     II  (x, y)
+    finish    II  (x, y)
+    bits      ceil(width * height / 8) байт, бит 1 - стена,
+              клетки по строкам, младший бит байта - первая клетка
+
+Набор уровней (LevelPack):
+    magic     4s  b"LBRP"
+    version   H
+    (2 байта выравнивания)
+    записи лабиринтов подряд
+    таблица смещений записей: count * Q
+    footer:   table_offset Q, count I, magic 4s b"LBRP"
+
+Таблица смещений лежит в конце, поэтому набор можно писать потоком,
+не зная заранее количество лабиринтов. Чтение идет через mmap: открытие
+набора стоит O(1) (заголовок и footer), а LevelPack[i] читает с диска
+только страницы своей записи.
+
+Сам лабиринт при чтении распаковывается целиком: Maze хранит сетку в
+bytearray (один байт на клетку), и ленивый доступ к битам замедлил бы
+все остальные пути. Поэтому загрузка стоит O(клеток), но это восемь
+проходов bytes.translate без цикла Python по байтам.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from maze import Maze, ALGORITHMS, WALL_CODE, PATH_CODE, START_CODE, FINISH_CODE
+
+FORMAT_VERSION = 1
+
+MAZE_MAGIC = b"LBRM"
+PACK_MAGIC = b"LBRP"
+
+MAZE_HEADER = struct.Struct("<4sHBBIIQIIII")
+PACK_HEADER = struct.Struct("<4sH2x")
+PACK_FOOTER = struct.Struct("<QI4s")
+PACK_OFFSET = struct.Struct("<Q")
+
+FLAG_HAS_SEED = 1
+MAX_SEED = 2 ** 64 - 1
+
+# Для каждого бита 0..7: байт упакованных битов -> код клетки этого бита
+# (таблицы для bytes.translate: каждая дает каждую восьмую клетку сетки)
+_BIT_PLANES = tuple(
+    bytes(WALL_CODE if (byte >> bit) & 1 else PATH_CODE for byte in range(256))
+    for bit in range(8)
+)
+# Обратная таблица: 8 байтов "1 - стена, 0 - проход" -> упакованный байт
+_PACK_TABLE = {
+    bytes((byte >> bit) & 1 for bit in range(8)): byte
+    for byte in range(256)
+}
+# Код клетки -> бит стены
+_WALL_BITS = bytes(1 if code == WALL_CODE else 0 for code in range(256))
+
+
+def pack_cells(cells):
+    """Упаковать компактную сетку в биты стен"""
+    wall_bits = bytes(cells).translate(_WALL_BITS)
+    padding = -len(wall_bits) % 8
+    wall_bits += bytes(padding)
+    pack_table = _PACK_TABLE
+    return bytes(pack_table[wall_bits[i:i + 8]] for i in range(0, len(wall_bits), 8))
+
+
+def unpack_cells(bits, cell_count):
+    """Распаковать биты стен обратно в компактную сетку"""
+    bits = bytes(bits)
+    cells = bytearray(len(bits) * 8)
+    # Восемь проходов translate вместо цикла Python по байтам
+    for bit, plane in enumerate(_BIT_PLANES):
+        cells[bit::8] = bits.translate(plane)
+    del cells[cell_count:]
+    return cells
+
+
+def encode_maze(maze):
+    """Закодировать лабиринт в одну запись формата"""
+    seed = maze.seed
+    flags = 0
+    if isinstance(seed, int) and 0 <= seed <= MAX_SEED:
+        flags |= FLAG_HAS_SEED
+    else:
+        seed = 0  # Нечисловые и отрицательные seed не сохраняются
+
+    header = MAZE_HEADER.pack(
+        MAZE_MAGIC, FORMAT_VERSION, ALGORITHMS.index(maze.algorithm), flags,
+        maze.width, maze.height, seed, *maze.start_pos, *maze.finish_pos
+    )
+    return header + pack_cells(maze.cells)
+
+
+def decode_maze(buffer, offset=0):
+    """Прочитать лабиринт из записи, начинающейся со смещения offset"""
+    (magic, version, algorithm, flags, width, height, seed,
+     start_x, start_y, finish_x, finish_y) = MAZE_HEADER.unpack_from(buffer, offset)
+    if magic != MAZE_MAGIC:
+        raise ValueError("Неверный формат файла лабиринта")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия файла лабиринта: {version}")
+
+    cell_count = width * height
+    bits_start = offset + MAZE_HEADER.size
+    bits = buffer[bits_start:bits_start + (cell_count + 7) // 8]
+    cells = unpack_cells(bits, cell_count)
+
+    # Старт и финиш хранятся в заголовке, в битах они просто проходы
+    start_pos, finish_pos = (start_x, start_y), (finish_x, finish_y)
+    cells[start_y * width + start_x] = START_CODE
+    cells[finish_y * width + finish_x] = FINISH_CODE
+
+    return Maze.from_cells(
+        width, height, cells, start_pos, finish_pos,
+        ALGORITHMS[algorithm], seed if flags & FLAG_HAS_SEED else None
+    )
+
+
+def save_maze(maze, path):
+    """Сохранить лабиринт в файл"""
+    with open(path, "wb") as file:
+        file.write(encode_maze(maze))
+
+
+def load_maze(path):
+    """Загрузить лабиринт из файла через mmap"""
+    with open(path, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return decode_maze(buffer)
+
+
+class LevelPackWriter:
+    """Потоковая запись набора уровней"""
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(PACK_HEADER.pack(PACK_MAGIC, FORMAT_VERSION))
+        self.offsets = array("Q")
+
+    def add(self, maze):
+        """Добавить лабиринт в набор"""
+        self.add_record(encode_maze(maze))
+
+    def add_record(self, record):
+        """Добавить уже закодированную запись (например, из воркера)"""
+        self.offsets.append(self.file.tell())
+        self.file.write(record)
+
+    def close(self):
+        """Дописать таблицу смещений и закрыть файл"""
+        if self.file.closed:
+            return
+        table_offset = self.file.tell()
+        if sys.byteorder != "little":
+            self.offsets.byteswap()
+        self.file.write(self.offsets.tobytes())
+        self.file.write(PACK_FOOTER.pack(table_offset, len(self.offsets), PACK_MAGIC))
+        self.file.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LevelPack:
+    """Набор уровней с произвольным доступом LevelPack[i] через mmap"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = PACK_HEADER.unpack_from(self.buffer, 0)
+        table_offset, count, footer_magic = PACK_FOOTER.unpack_from(
+            self.buffer, len(self.buffer) - PACK_FOOTER.size)
+        if magic != PACK_MAGIC or footer_magic != PACK_MAGIC:
+            self.close()
+            raise ValueError("Неверный формат набора уровней")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемая версия набора уровней: {version}")
+
+        # Смещения читаются по индексу прямо из отображения, без копирования таблицы
+        self.table_offset = table_offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Номер уровня вне набора")
+        offset, = PACK_OFFSET.unpack_from(self.buffer, self.table_offset + index * PACK_OFFSET.size)
+        return decode_maze(self.buffer, offset)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self):
+        """Закрыть набор"""
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,221 @@
+"""
+Граф коридоров и развилок лабиринта
+
+Почти каждая клетка лабиринта лежит в коридоре с двумя открытыми
+соседями. Индекс сворачивает такие коридоры в ребра между узлами
+(развилками, тупиками, стартом и финишем). У каждого ребра есть длина и
+список клеток, а каждая клетка коридора знает свое ребро и место на нем.
+Поэтому поиск идет по гораздо меньшему графу, а "добежать до следующей
+развилки" - это O(1).
+"""
+
+import heapq
+from array import array
+from colors import DIRECTION_DELTAS
+from maze import WALKABLE_CODES
+
+NO_EDGE = -1
+NO_NODE = -1
+
+
+class MazeGraph:
+    """Индекс коридоров и развилок, строится один раз на лабиринт"""
+
+    def __init__(self, maze):
+        self.width = maze.width
+        self.height = maze.height
+        cell_count = maze.width * maze.height
+
+        self.walkable = bytes(maze.cells).translate(WALKABLE_CODES)
+        self.node_cells = array('i')  # Номер узла -> индекс клетки
+        self.node_id = array('i', [NO_NODE]) * cell_count
+        self.node_edges = array('i')  # Номер узла * 4 + направление -> ребро
+
+        # Ребра: концы, длина и клетки (подряд в edge_cells, с концами)
+        self.edge_start = array('i')
+        self.edge_end = array('i')
+        self.edge_cells = array('i')
+        self.edge_offsets = array('i', [0])
+
+        # Клетка коридора -> ребро и ее номер на ребре
+        self.cell_edge = array('i', [NO_EDGE]) * cell_count
+        self.cell_offset = array('i', [0]) * cell_count
+
+        self.build(maze)
+
+    def neighbor_steps(self, index):
+        """Открытые соседи клетки: (направление, индекс соседа)"""
+        width, height = self.width, self.height
+        x, y = index % width, index // width
+        steps = []
+        for direction, (dx, dy) in enumerate(DIRECTION_DELTAS):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and self.walkable[ny * width + nx]:
+                steps.append((direction, ny * width + nx))
+        return steps
+
+    def add_node(self, index):
+        node = len(self.node_cells)
+        self.node_cells.append(index)
+        self.node_id[index] = node
+        self.node_edges.extend((NO_EDGE, NO_EDGE, NO_EDGE, NO_EDGE))
+        return node
+
+    def build(self, maze):
+        """Найти узлы и протянуть ребра вдоль коридоров"""
+        width = self.width
+        special = {maze.start_pos[1] * width + maze.start_pos[0],
+                   maze.finish_pos[1] * width + maze.finish_pos[0]}
+
+        # Узлы: все, кроме клеток ровно с двумя соседями (и старт с финишем)
+        for index, open_cell in enumerate(self.walkable):
+            if open_cell and (index in special or len(self.neighbor_steps(index)) != 2):
+                self.add_node(index)
+
+        node = 0
+        while node < len(self.node_cells):
+            self.trace_edges(node)
+            node += 1
+
+            # Кольцевые коридоры без развилок: делаем узлом любую их клетку
+            if node == len(self.node_cells):
+                for index, open_cell in enumerate(self.walkable):
+                    if (open_cell and self.node_id[index] == NO_NODE
+                            and self.cell_edge[index] == NO_EDGE):
+                        self.add_node(index)
+                        break
+
+    def trace_edges(self, node):
+        """Протянуть из узла все ребра, которые еще не протянуты"""
+        origin = self.node_cells[node]
+        for direction, first in self.neighbor_steps(origin):
+            if self.node_edges[node * 4 + direction] != NO_EDGE:
+                continue
+
+            edge = len(self.edge_start)
+            cells = [origin]
+            previous, current = origin, first
+            while self.node_id[current] == NO_NODE:
+                self.cell_edge[current] = edge
+                self.cell_offset[current] = len(cells)
+                cells.append(current)
+                # В коридоре ровно два соседа: идем к тому, откуда не пришли
+                for _, neighbor in self.neighbor_steps(current):
+                    if neighbor != previous:
+                        previous, current = current, neighbor
+                        break
+            cells.append(current)
+
+            end_node = self.node_id[current]
+            self.edge_start.append(node)
+            self.edge_end.append(end_node)
+            self.edge_cells.extend(cells)
+            self.edge_offsets.append(len(self.edge_cells))
+
+            # Ребро занимает выход из обоих концов
+            self.node_edges[node * 4 + direction] = edge
+            self.node_edges[end_node * 4 + self.direction_between(current, previous)] = edge
+
+    def direction_between(self, index, neighbor):
+        """Направление шага из клетки index в соседнюю клетку"""
+        delta = neighbor - index
+        if delta == -self.width:
+            return 0
+        if delta == self.width:
+            return 1
+        return 2 if delta == -1 else 3
+
+    @property
+    def node_count(self):
+        return len(self.node_cells)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_start)
+
+    def edge_length(self, edge):
+        """Длина ребра в ходах"""
+        return self.edge_offsets[edge + 1] - self.edge_offsets[edge] - 1
+
+    def get_edge_cells(self, edge):
+        """Клетки ребра (x, y) от начального узла к конечному"""
+        width = self.width
+        return [(index % width, index // width)
+                for index in self.edge_cells[self.edge_offsets[edge]:self.edge_offsets[edge + 1]]]
+
+    def get_cell_edge(self, x, y):
+        """Ребро, на котором лежит клетка коридора (NO_EDGE для узлов и стен)"""
+        return self.cell_edge[y * self.width + x]
+
+    def next_junction(self, x, y, direction):
+        """Куда приведет бег по коридору из (x, y) в направлении direction.
+
+        Возвращает (x, y, число ходов) ближайшего узла или None, если в
+        этом направлении стена.
+        """
+        width = self.width
+        dx, dy = DIRECTION_DELTAS[direction]
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < width and 0 <= ny < self.height and self.walkable[ny * width + nx]):
+            return None
+
+        index, neighbor = y * width + x, ny * width + nx
+        node = self.node_id[index]
+        if node != NO_NODE:
+            edge = self.node_edges[node * 4 + direction]
+            start = self.edge_offsets[edge]
+            # Ребро могло быть протянуто с другого конца
+            forward = self.edge_cells[start] == index and self.edge_cells[start + 1] == neighbor
+            offset = 0 if forward else self.edge_length(edge)
+        else:
+            edge = self.cell_edge[index]
+            offset = self.cell_offset[index]
+            forward = self.edge_cells[self.edge_offsets[edge] + offset + 1] == neighbor
+
+        length = self.edge_length(edge)
+        if forward:
+            end, steps = self.edge_end[edge], length - offset
+        else:
+            end, steps = self.edge_start[edge], offset
+        end_index = self.node_cells[end]
+        return end_index % width, end_index // width, steps
+
+    def node_neighbors(self, node):
+        """Соседние узлы: (узел, длина ребра, ребро)"""
+        for direction in range(4):
+            edge = self.node_edges[node * 4 + direction]
+            if edge == NO_EDGE:
+                continue
+            other = self.edge_end[edge] if self.edge_start[edge] == node else self.edge_start[edge]
+            yield other, self.edge_length(edge), edge
+
+    def node_distances(self, source):
+        """Дейкстра по графу узлов: {узел: расстояние в ходах}"""
+        distances = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            for other, length, _ in self.node_neighbors(node):
+                new_distance = distance + length
+                if new_distance < distances.get(other, new_distance + 1):
+                    distances[other] = new_distance
+                    heapq.heappush(heap, (new_distance, other))
+        return distances
+
+    def path_length(self, start, goal):
+        """Длина кратчайшего пути между двумя узлами (x, y) или None"""
+        width = self.width
+        source = self.node_id[start[1] * width + start[0]]
+        target = self.node_id[goal[1] * width + goal[0]]
+        if source == NO_NODE or target == NO_NODE:
+            raise ValueError("Клетка не является узлом графа")
+        return self.node_distances(source).get(target)
+
+
+def get_maze_graph(maze):
+    """Граф коридоров, закэшированный на лабиринте"""
+    if maze.graph_index is None:
+        maze.graph_index = MazeGraph(maze)
+    return maze.graph_index
@@ -0,0 +1,155 @@
+"""
+Мини-карта лабиринта
+
+Картинка строится векторными операциями: сетка клеток сжимается до
+размера виджета (каждый пиксель - доля стен в своем блоке клеток), и
+уровни пропускаются через таблицу цветов прямо в массив пикселей
+(pygame.surfarray + NumPy). Старт и финиш отмечаются поверх. Картинка
+кэшируется на лабиринт, а каждый кадр дорисовываются только след игрока,
+рамка камеры и сам игрок.
+
+NumPy необязателен и импортируется только при первой постройке
+картинки (его импорт долгий, а мини-карта нужна не всегда). Без него картинка собирается из палитровой
+поверхности и масштабируется pygame (коридоры при сильном уменьшении
+могут теряться).
+"""
+
+import pygame
+from colors import Colors, CellType, CELL_COLORS
+from lazy_numpy import load_numpy
+
+TRAIL_COLOR = (255, 120, 120)
+
+
+def build_palette():
+    """Таблица цветов на все 256 кодов (неизвестные коды - черные)"""
+    palette = [Colors.BLACK] * 256
+    for cell_type, color in CELL_COLORS.items():
+        palette[cell_type.value] = color
+    return palette
+
+
+def build_shades():
+    """Таблица цветов по уровню 0..255 - доле стен в блоке (от прохода к стене)"""
+    path = CELL_COLORS[CellType.PATH]
+    wall = CELL_COLORS[CellType.WALL]
+    return [tuple(p + (w - p) * level // 255 for p, w in zip(path, wall))
+            for level in range(256)]
+
+
+PALETTE = build_palette()
+SHADES = build_shades()
+
+
+def block_starts(cells, pixels):
+    """Первая клетка блока для каждого пикселя и число клеток в блоке"""
+    numpy = load_numpy()
+    starts = numpy.arange(pixels) * cells // pixels
+    # При увеличении начала повторяются: такой блок - одна клетка
+    sizes = numpy.maximum(numpy.diff(numpy.append(starts, cells)), 1)
+    return starts, sizes
+
+
+def wall_levels(maze, width, height):
+    """Уровни 0..255 размера height x width: доля стен в каждом блоке клеток"""
+    numpy = load_numpy()
+    grid = numpy.frombuffer(maze.get_grid_buffer(), dtype=numpy.uint8)
+    walls = (grid.reshape(maze.height, maze.width) == CellType.WALL.value)
+    rows, row_sizes = block_starts(maze.height, height)
+    columns, column_sizes = block_starts(maze.width, width)
+    counts = numpy.add.reduceat(walls, rows, axis=0, dtype=numpy.uint32)
+    counts = numpy.add.reduceat(counts, columns, axis=1, dtype=numpy.uint32)
+    return (counts * 255 // numpy.outer(row_sizes, column_sizes)).astype(numpy.uint8)
+
+
+def render_minimap_image(maze, width, height):
+    """Картинка всего лабиринта размером width x height (без отметок старта и финиша)"""
+    numpy = load_numpy()
+    if numpy is not None:
+        lookup = numpy.array(SHADES, dtype=numpy.uint8)
+        pixels = lookup[wall_levels(maze, width, height)]
+        # surfarray ждет оси (x, y, цвет)
+        return pygame.surfarray.make_surface(pixels.swapaxes(0, 1))
+
+    surface = pygame.image.frombuffer(bytes(maze.cells), (maze.width, maze.height), "P")
+    surface.set_palette(PALETTE)
+    return pygame.transform.scale(surface.convert(24), (width, height))
+
+
+class Minimap:
+    """Виджет мини-карты в прямоугольнике rect"""
+
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.maze = None
+        self.image = None
+        self.trail = None
+        self.trail_player = None
+        self.trail_total = 0
+        self.image_rect = None
+
+    def set_maze(self, maze):
+        """Построить картинку для нового лабиринта (с сохранением пропорций)"""
+        scale = min(self.rect.width / maze.width, self.rect.height / maze.height)
+        width = max(1, int(maze.width * scale))
+        height = max(1, int(maze.height * scale))
+        self.image = render_minimap_image(maze, width, height)
+        self.image_rect = self.image.get_rect(center=self.rect.center)
+        self.maze = maze
+        
+        # Старт и финиш не должны теряться при сжатии
+        for cell_type, position in ((CellType.START, maze.start_pos),
+                                    (CellType.FINISH, maze.finish_pos)):
+            self.image.fill(CELL_COLORS[cell_type], self.get_cell_area(*position))
+        self.reset_trail(None)
+
+    def reset_trail(self, player):
+        """Начать след заново (новый игрок или новый лабиринт)"""
+        self.trail = pygame.Surface(self.image_rect.size, pygame.SRCALPHA)
+        self.trail_player = player
+        self.trail_total = 0
+
+    def cell_to_pixel(self, x, y):
+        """Точка мини-карты (относительно картинки), соответствующая клетке"""
+        return (x * self.image_rect.width // self.maze.width,
+                y * self.image_rect.height // self.maze.height)
+
+    def get_cell_area(self, x, y):
+        """Пиксели картинки, занятые клеткой (не меньше одного)"""
+        left, top = self.cell_to_pixel(x, y)
+        right, bottom = self.cell_to_pixel(x + 1, y + 1)
+        return pygame.Rect(left, top, max(1, right - left), max(1, bottom - top))
+
+    def update_trail(self, player):
+        """Дорисовать в след только ходы, сделанные с прошлого кадра"""
+        history = player.move_history
+        if player is not self.trail_player or history.total < self.trail_total:
+            self.reset_trail(player)
+        # В кольцевом режиме старые ходы уже могли вытесниться
+        new_moves = min(history.total - self.trail_total, len(history))
+        for index in range(len(history) - new_moves, len(history)):
+            _, new_pos = history[index]
+            self.trail.set_at(self.cell_to_pixel(*new_pos), TRAIL_COLOR)
+        self.trail_total = history.total
+
+    def draw(self, screen, maze, player, visible_range=None):
+        """Нарисовать мини-карту; visible_range - окно камеры (x0, y0, x1, y1)"""
+        if maze is not self.maze:
+            self.set_maze(maze)
+        self.update_trail(player)
+
+        pygame.draw.rect(screen, Colors.WHITE, self.rect)
+        screen.blit(self.image, self.image_rect)
+        screen.blit(self.trail, self.image_rect)
+
+        left, top = self.image_rect.topleft
+        if visible_range is not None:
+            x0, y0, x1, y1 = visible_range
+            px0, py0 = self.cell_to_pixel(x0, y0)
+            px1, py1 = self.cell_to_pixel(x1, y1)
+            frame = pygame.Rect(left + px0, top + py0, max(2, px1 - px0), max(2, py1 - py0))
+            pygame.draw.rect(screen, Colors.BLUE, frame, 1)
+
+        px, py = self.cell_to_pixel(player.x, player.y)
+        pygame.draw.circle(screen, Colors.RED, (left + px, top + py), 2)
+        return self.rect
@@ -0,0 +1,181 @@
+"""
+Компактные журналы ходов
+
+Вместо списка словарей и кортежей каждое поле хранится в своем
+типизированном массиве (array), а сообщения для людей собираются только
+при чтении. В режиме кольцевого буфера (capacity) хранятся последние N
+записей, а итоговые счетчики остаются точными.
+"""
+
+from array import array
+
+# Коды команд в журнале выполнения
+COMMAND_UP = 0
+COMMAND_DOWN = 1
+COMMAND_LEFT = 2
+COMMAND_RIGHT = 3
+COMMAND_FINISH = 4
+# Пробежки до стены: код = RUN_OFFSET + направление
+RUN_OFFSET = 5
+COMMAND_RUN_UP = RUN_OFFSET + COMMAND_UP
+COMMAND_RUN_DOWN = RUN_OFFSET + COMMAND_DOWN
+COMMAND_RUN_LEFT = RUN_OFFSET + COMMAND_LEFT
+COMMAND_RUN_RIGHT = RUN_OFFSET + COMMAND_RIGHT
+
+COMMAND_NAMES = ("move_up()", "move_down()", "move_left()", "move_right()", "FINISH",
+                 "run_up()", "run_down()", "run_left()", "run_right()")
+COMMAND_CODES = {name: code for code, name in enumerate(COMMAND_NAMES)}
+
+# Направление в сообщении о стене
+DIRECTION_WORDS = ("вверх", "вниз", "влево", "вправо")
+
+FINISH_MESSAGE = "🎉 Поздравляем! Вы достигли финиша!"
+
+
+class RingArrays:
+    """Набор параллельных типизированных массивов с необязательным кольцевым режимом"""
+
+    def __init__(self, typecodes, capacity=None):
+        self.typecodes = typecodes
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        """Очистить записи и счетчик"""
+        self.columns = [array(typecode) for typecode in self.typecodes]
+        self.total = 0  # Сколько записей добавлено за все время
+        self.head = 0  # Индекс самой старой записи в кольцевом режиме
+
+    def append(self, *values):
+        """Добавить запись (по значению в каждый массив)"""
+        if self.capacity is None or len(self.columns[0]) < self.capacity:
+            for column, value in zip(self.columns, values):
+                column.append(value)
+        else:
+            # Буфер полон - перезаписываем самую старую запись
+            for column, value in zip(self.columns, values):
+                column[self.head] = value
+            self.head = (self.head + 1) % self.capacity
+        self.total += 1
+
+    def extend(self, *values):
+        """Добавить много записей сразу (по последовательности значений на массив)"""
+        count = len(values[0])
+        self.total += count
+        if self.capacity is None:
+            for column, column_values in zip(self.columns, values):
+                column.extend(column_values)
+            return
+
+        # Из записей сверх capacity нужны только последние capacity
+        skip = max(0, count - self.capacity)
+        fill = min(self.capacity - len(self), count - skip)
+        rest = count - skip - fill  # Сколько перезаписать по кругу, начиная с head
+        first = min(rest, self.capacity - self.head)
+        for column, column_values in zip(self.columns, values):
+            column.extend(column_values[skip:skip + fill])
+            if rest:
+                tail = array(column.typecode)
+                tail.extend(column_values[skip + fill:])  # bytes - по числу на байт
+                column[self.head:self.head + first] = tail[:first]
+                column[:rest - first] = tail[first:]
+        self.head = (self.head + rest) % self.capacity
+
+    def __len__(self):
+        """Сколько записей хранится сейчас (не больше capacity)"""
+        return len(self.columns[0])
+
+    def row(self, index):
+        """Запись по номеру среди хранимых (отрицательные - с конца)"""
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("Номер записи вне журнала")
+        position = (self.head + index) % size
+        return tuple(column[position] for column in self.columns)
+
+
+class MoveHistory(RingArrays):
+    """История перемещений игрока: откуда и куда"""
+
+    def __init__(self, capacity=None):
+        super().__init__("iiii", capacity)
+
+    def append_move(self, old_pos, new_pos):
+        """Записать перемещение"""
+        self.append(old_pos[0], old_pos[1], new_pos[0], new_pos[1])
+
+    def __getitem__(self, index):
+        old_x, old_y, new_x, new_y = self.row(index)
+        return (old_x, old_y), (new_x, new_y)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class MoveLog(RingArrays):
+    """Журнал выполнения команд: код команды, успех, позиция после нее,
+    сколько клеток пройдено и сколько просили (для move_*(n))"""
+
+    def __init__(self, capacity=None):
+        super().__init__("BBiiII", capacity)
+        self.success_count = 0
+
+    def clear(self):
+        super().clear()
+        self.success_count = 0
+
+    def log(self, command_code, success, position, steps=1, requested=1):
+        """Записать выполнение команды"""
+        self.append(command_code, 1 if success else 0, position[0], position[1], steps, requested)
+        if success:
+            self.success_count += 1
+
+    def log_many(self, command_codes, successes, xs, ys, steps, requested):
+        """Записать много команд сразу (по последовательности на поле, successes - 0/1)"""
+        self.extend(command_codes, successes, xs, ys, steps, requested)
+        self.success_count += sum(successes)
+
+    def __getitem__(self, index):
+        """Запись журнала в прежнем виде (словарь с сообщением)"""
+        command_code, success, x, y, steps, requested = self.row(index)
+        return {
+            'command': self.build_command(command_code, requested),
+            'success': bool(success),
+            'message': self.build_message(command_code, success, x, y, steps, requested),
+            'position': (x, y),
+            'steps': steps
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def recent(self, count):
+        """Последние count записей (сообщения строятся только для них)"""
+        return [self[index] for index in range(max(0, len(self) - count), len(self))]
+
+    @staticmethod
+    def build_command(command_code, requested):
+        """Текст команды, как ее написал игрок"""
+        if command_code < COMMAND_FINISH and requested != 1:
+            return COMMAND_NAMES[command_code].replace("()", f"({requested})")
+        return COMMAND_NAMES[command_code]
+
+    @staticmethod
+    def build_message(command_code, success, x, y, steps=1, requested=1):
+        """Сообщение для человека по коду команды"""
+        if command_code == COMMAND_FINISH:
+            return FINISH_MESSAGE
+        direction = command_code % RUN_OFFSET
+        if not success and not steps:
+            return f"Нельзя двигаться {DIRECTION_WORDS[direction]} - стена!"
+        if command_code >= RUN_OFFSET:
+            return f"Пробежка на {steps} до ({x}, {y})"
+        if success and requested == 1:
+            return f"Перемещение в ({x}, {y})"
+        if success:
+            return f"Перемещение на {steps} в ({x}, {y})"
+        return f"Пройдено {steps} из {requested}, дальше стена! Позиция ({x}, {y})"
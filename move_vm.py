@@ -0,0 +1,265 @@
+"""
+Компилятор программ игрока в байткод ходов и быстрая виртуальная машина
+
+Понимает подмножество программ, которое пишут дети:
+    move_up() / move_down() / move_left() / move_right()
+    for i in range(...):     (аргументы range - целые константы)
+    while <условие>:
+    if <условие>: ... else: ...
+    pass
+где условие - is_at_finish(), not <условие>, True или False.
+Все остальное compile_moves не компилирует (возвращает None), и такая
+программа выполняется обычным exec.
+
+Машина работает прямо по компактной сетке лабиринта и ничего не меняет,
+пока программа не дошла до конца: результат (ходы) применяется разом.
+Если программа выходит за лимиты, run_moves сообщает об этом, и
+интерпретатор перезапускает ее через exec, чтобы ошибка и частичный
+результат совпали до хода.
+"""
+
+import ast
+from array import array
+from maze import WALKABLE_CODES, FINISH_CODE
+from colors import DIRECTION_DELTAS
+from move_log import COMMAND_UP, COMMAND_DOWN, COMMAND_LEFT, COMMAND_RIGHT
+
+# Коды операций. Шаги машины - ровно строки, которые насчитал бы счетчик
+# в exec (по одной на каждую выполненную инструкцию программы): шаг
+# делают MOVE, NOP, SET_COUNTER (строка for) и JUMP_IF_* (строка if), а
+# переходы, LOOP и BRANCH_IF_* (проверка while на каждом круге) - нет.
+# Поэтому лимит строк и lines_executed на машине и в exec совпадают.
+OP_HALT = 0
+OP_MOVE = 1             # MOVE направление
+OP_JUMP = 2             # JUMP адрес
+OP_JUMP_IF_FINISH = 3   # JUMP_IF_FINISH адрес
+OP_JUMP_IF_NOT_FINISH = 4
+OP_SET_COUNTER = 5      # SET_COUNTER слот число
+OP_LOOP = 6             # LOOP слот адрес_выхода: счетчик > 0 - уменьшить, иначе прыжок
+OP_NOP = 7              # pass, строка while и условие-константа в if
+OP_BRANCH_IF_FINISH = 8  # Как JUMP_IF_*, но без шага
+OP_BRANCH_IF_NOT_FINISH = 9
+
+MOVE_COMMANDS = {
+    'move_up': COMMAND_UP,
+    'move_down': COMMAND_DOWN,
+    'move_left': COMMAND_LEFT,
+    'move_right': COMMAND_RIGHT,
+}
+
+# Байткод хранится в array('i'): длина цикла должна помещаться в int
+MAX_LOOP_COUNT = 2 ** 31 - 1
+
+# Итог работы машины
+RESULT_DONE = "done"
+RESULT_FALLBACK = "fallback"  # Лимит мог сработать - нужен точный exec
+
+
+class UnsupportedProgram(Exception):
+    """Программа вне поддерживаемого подмножества"""
+
+
+class MoveCompiler:
+    """Перевод AST программы игрока в байткод ходов"""
+
+    def __init__(self):
+        self.code = []
+        self.counter_slots = 0
+
+    def emit(self, *values):
+        """Добавить операцию, вернуть ее адрес"""
+        address = len(self.code)
+        self.code.extend(values)
+        return address
+
+    def patch(self, address, value):
+        """Дописать адрес прыжка в уже выпущенную операцию"""
+        self.code[address] = value
+
+    def compile_body(self, statements):
+        for statement in statements:
+            self.compile_statement(statement)
+
+    def compile_statement(self, node):
+        if isinstance(node, ast.Expr):
+            self.emit(OP_MOVE, self.move_direction(node.value))
+        elif isinstance(node, ast.Pass):
+            self.emit(OP_NOP)
+        elif isinstance(node, ast.For):
+            self.compile_for(node)
+        elif isinstance(node, ast.While):
+            self.compile_while(node)
+        elif isinstance(node, ast.If):
+            self.compile_if(node)
+        else:
+            raise UnsupportedProgram(type(node).__name__)
+
+    def move_direction(self, node):
+        """Код направления для вызова move_*() без аргументов"""
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in MOVE_COMMANDS and not node.args and not node.keywords):
+            return MOVE_COMMANDS[node.func.id]
+        raise UnsupportedProgram("выражение")
+
+    def range_length(self, node):
+        """Число итераций для range(...) с целыми константами"""
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == 'range' and 1 <= len(node.args) <= 3 and not node.keywords):
+            raise UnsupportedProgram("for")
+        values = []
+        for arg in node.args:
+            if not (isinstance(arg, ast.Constant) and type(arg.value) is int):
+                raise UnsupportedProgram("range")
+            values.append(arg.value)
+        if len(values) == 3 and values[2] == 0:
+            raise UnsupportedProgram("range")  # exec выдаст ValueError
+        try:
+            length = len(range(*values))
+        except OverflowError:
+            raise UnsupportedProgram("range") from None  # Длина не помещается в ssize_t
+        if length > MAX_LOOP_COUNT:
+            raise UnsupportedProgram("range")  # Такой цикл все равно упрется в лимит строк
+        return length
+
+    def compile_for(self, node):
+        if node.orelse or not isinstance(node.target, ast.Name):
+            raise UnsupportedProgram("for")
+        slot = self.counter_slots
+        self.counter_slots += 1
+        self.emit(OP_SET_COUNTER, slot, self.range_length(node.iter))
+        loop = self.emit(OP_LOOP, slot, 0)
+        self.compile_body(node.body)
+        self.emit(OP_JUMP, loop)
+        self.patch(loop + 2, len(self.code))
+
+    def compile_while(self, node):
+        if node.orelse:
+            raise UnsupportedProgram("while")
+        self.emit(OP_NOP)  # Строка while считается один раз, как в exec
+        start = len(self.code)
+        exits = self.compile_test(node.test, counted=False)
+        self.compile_body(node.body)
+        self.emit(OP_JUMP, start)
+        for address in exits:
+            self.patch(address, len(self.code))
+
+    def compile_if(self, node):
+        exits = self.compile_test(node.test)
+        self.compile_body(node.body)
+        if node.orelse:
+            skip_else = self.emit(OP_JUMP, 0)
+            for address in exits:
+                self.patch(address, len(self.code))
+            self.compile_body(node.orelse)
+            self.patch(skip_else + 1, len(self.code))
+        else:
+            for address in exits:
+                self.patch(address, len(self.code))
+
+    def compile_test(self, node, counted=True):
+        """Выпустить проверку условия; вернуть адреса, куда дописать прыжок "если ложно".
+
+        counted - проверка сама делает шаг (строка if); проверки while
+        на каждом круге шагов не делают.
+        """
+        negate = False
+        while isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            negate = not negate
+            node = node.operand
+
+        if isinstance(node, ast.Constant) and type(node.value) is bool:
+            # Проверка константы - тоже шаг, даже если дальше только прыжок
+            if counted:
+                self.emit(OP_NOP)
+            if node.value != negate:
+                return []
+            return [self.emit(OP_JUMP, 0) + 1]
+
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == 'is_at_finish' and not node.args and not node.keywords):
+            if counted:
+                op = OP_JUMP_IF_FINISH if negate else OP_JUMP_IF_NOT_FINISH
+            else:
+                op = OP_BRANCH_IF_FINISH if negate else OP_BRANCH_IF_NOT_FINISH
+            return [self.emit(op, 0) + 1]
+
+        raise UnsupportedProgram("условие")
+
+
+def compile_moves(code):
+    """Скомпилировать программу в байткод (array) или вернуть None, если она вне подмножества"""
+    try:
+        tree = ast.parse(code)
+        compiler = MoveCompiler()
+        compiler.compile_body(tree.body)
+        compiler.emit(OP_HALT)
+        bytecode = array('i', compiler.code)
+    except (SyntaxError, UnsupportedProgram, OverflowError):
+        return None
+    return bytecode, compiler.counter_slots
+
+
+def run_moves(program, maze, x, y, max_moves, max_steps):
+    """Выполнить байткод на лабиринте, не трогая игрока.
+
+    Возвращает (результат, ходы, шаги), где ходы - array('B') со значениями
+    направление * 2 + успех. Результат RESULT_FALLBACK означает, что
+    программа превысила бы max_moves или max_steps (None - без лимита).
+    """
+    bytecode, counter_slots = program
+    counters = [0] * counter_slots
+    cells = maze.cells
+    width, height = maze.width, maze.height
+    walkable = WALKABLE_CODES
+    moves = array('B')
+    move_count = 0
+    steps = 0
+    pc = 0
+
+    while True:
+        op = bytecode[pc]
+        if op == OP_MOVE:
+            steps += 1
+            move_count += 1
+            if max_moves is not None and move_count > max_moves:
+                return RESULT_FALLBACK, moves, steps
+            direction = bytecode[pc + 1]
+            dx, dy = DIRECTION_DELTAS[direction]
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and walkable[cells[ny * width + nx]]:
+                x, y = nx, ny
+                moves.append(direction * 2 + 1)
+            else:
+                moves.append(direction * 2)
+            pc += 2
+        elif op == OP_LOOP:
+            slot = bytecode[pc + 1]
+            if counters[slot] > 0:
+                counters[slot] -= 1
+                pc += 3
+            else:
+                pc = bytecode[pc + 2]
+        elif op == OP_JUMP:
+            pc = bytecode[pc + 1]
+        elif op == OP_JUMP_IF_NOT_FINISH:
+            steps += 1
+            pc = pc + 2 if cells[y * width + x] == FINISH_CODE else bytecode[pc + 1]
+        elif op == OP_JUMP_IF_FINISH:
+            steps += 1
+            pc = bytecode[pc + 1] if cells[y * width + x] == FINISH_CODE else pc + 2
+        elif op == OP_BRANCH_IF_NOT_FINISH:
+            pc = pc + 2 if cells[y * width + x] == FINISH_CODE else bytecode[pc + 1]
+        elif op == OP_BRANCH_IF_FINISH:
+            pc = bytecode[pc + 1] if cells[y * width + x] == FINISH_CODE else pc + 2
+        elif op == OP_SET_COUNTER:
+            steps += 1
+            counters[bytecode[pc + 1]] = bytecode[pc + 2]
+            pc += 3
+        elif op == OP_NOP:
+            steps += 1
+            pc += 1
+        else:  # OP_HALT
+            return RESULT_DONE, moves, steps
+
+        if max_steps is not None and steps > max_steps:
+            return RESULT_FALLBACK, moves, steps
@@ -2,16 +2,156 @@
 Модуль игрока и интерпретатора команд
 """
 
+import ast
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+from colors import DIRECTION_DELTAS
+from move_log import MoveHistory, MoveLog
+from move_log import COMMAND_UP, COMMAND_DOWN, COMMAND_LEFT, COMMAND_RIGHT, COMMAND_FINISH
+from move_log import RUN_OFFSET
+from move_vm import compile_moves, run_moves, RESULT_DONE
+
+# Сколько скомпилированных программ держать в кэше
+PROGRAM_CACHE_SIZE = 128
+
+# Имя "файла" для кода игрока (в сообщениях об ошибках)
+PROGRAM_FILENAME = "<код игрока>"
+
+# Запись машины ходов (направление * 2 + успех) -> направление, успех и
+# смещение; смещения - байты со знаком (255 = -1) для array('b')
+ENTRY_DIRECTIONS = bytes(entry >> 1 & 3 for entry in range(256))
+ENTRY_SUCCESSES = bytes(entry & 1 for entry in range(256))
+FAILED_ENTRIES = bytes(direction * 2 for direction in range(4))
+DIRECTION_DX = bytes(DIRECTION_DELTAS[code & 3][0] & 0xFF for code in range(256))
+DIRECTION_DY = bytes(DIRECTION_DELTAS[code & 3][1] & 0xFF for code in range(256))
+ENTRY_DX = bytes(DIRECTION_DELTAS[entry >> 1 & 3][0] & 0xFF if entry & 1 else 0 for entry in range(256))
+ENTRY_DY = bytes(DIRECTION_DELTAS[entry >> 1 & 3][1] & 0xFF if entry & 1 else 0 for entry in range(256))
+
+# Имя счетчика строк, вызов которого вставляется в программу игрока
+LINE_COUNTER_NAME = "__count_line__"
+
+# Ограничения на выполнение программы игрока. Ходы и строки считаются
+# детерминированно, поэтому проверка воспроизводима; время - страховка.
+DEFAULT_MAX_MOVES = 10000
+DEFAULT_MAX_LINES = 500000
+DEFAULT_TIME_LIMIT = 2.0  # секунды
+TIME_CHECK_INTERVAL = 1000  # как часто (в строках) смотреть на часы
+# Предел шагов быстрой машины ходов, если лимит строк отключен
+VM_MAX_STEPS = DEFAULT_MAX_LINES
+
+
+class ExecutionLimitExceeded(BaseException):
+    """Программа игрока превысила лимит ходов, строк или времени.
+
+    Наследуется от BaseException, чтобы `except Exception` в коде
+    игрока не мог ее перехватить.
+    """
+
+
+class LineCounterInserter(ast.NodeTransformer):
+    """Вставляет подсчет строк в программу игрока.
+
+    Перед каждой инструкцией (и в телах циклов, условий, функций) ставится
+    вызов LINE_COUNTER_NAME, а в каждый генератор - условие с тем же
+    вызовом, чтобы считалась каждая итерация. Так строки и время считаются
+    без sys.settrace, который замедлял бы каждый вызов Python (и команды
+    движения тоже), а не только код игрока.
+    """
+    
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        for field in ('body', 'orelse', 'finalbody'):
+            statements = getattr(node, field, None)
+            if statements and isinstance(statements, list) and isinstance(statements[0], ast.stmt):
+                counted = []
+                for statement in statements:
+                    counted.append(ast.copy_location(ast.Expr(self.make_call()), statement))
+                    counted.append(statement)
+                setattr(node, field, counted)
+        return node
+    
+    def visit_comprehension(self, node):
+        self.generic_visit(node)
+        node.ifs.append(ast.copy_location(self.make_call(), node.iter))
+        return node
+    
+    @staticmethod
+    def make_call():
+        return ast.Call(ast.Name(LINE_COUNTER_NAME, ast.Load()), [], [])
+
+
+def compile_program(code):
+    """Скомпилировать код игрока со счетчиком строк (SyntaxError пробрасывается)"""
+    tree = ast.parse(code, PROGRAM_FILENAME)
+    for node in ast.walk(tree):
+        if LINE_COUNTER_NAME in (getattr(node, 'id', None), getattr(node, 'arg', None),
+                                 getattr(node, 'name', None)):
+            error = SyntaxError(f"имя {LINE_COUNTER_NAME} зарезервировано")
+            error.lineno = getattr(node, 'lineno', None)
+            raise error
+    tree = LineCounterInserter().visit(tree)
+    return compile(ast.fix_missing_locations(tree), PROGRAM_FILENAME, "exec")
+
+
+class ProgramCache:
+    """LRU-кэш скомпилированных программ по хэшу исходного текста"""
+    
+    def __init__(self, max_size=PROGRAM_CACHE_SIZE):
+        self.max_size = max_size
+        self.programs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def compile(self, code):
+        """Скомпилировать код (SyntaxError пробрасывается).
+
+        Возвращает пару (объект кода, байткод ходов или None, если
+        программа вне подмножества move_vm).
+        """
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        program = self.programs.get(key)
+        if program is not None:
+            self.hits += 1
+            self.programs.move_to_end(key)
+            return program
+        
+        self.misses += 1
+        program = (compile_program(code), compile_moves(code))
+        self.programs[key] = program
+        if len(self.programs) > self.max_size:
+            self.programs.popitem(last=False)
+        return program
+    
+    def get_stats(self):
+        """Получить статистику кэша"""
+        return {
+            'size': len(self.programs),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+# Общий кэш для всех интерпретаторов: одна и та же программа
+# при проверке на сотнях лабиринтов компилируется один раз
+program_cache = ProgramCache()
+
+
 class Player:
     """Класс игрока в лабиринте"""
     
-    def __init__(self, start_x, start_y):
+    def __init__(self, start_x, start_y, history_limit=None, recorder=None):
         self.x = start_x
         self.y = start_y
         self.start_x = start_x
         self.start_y = start_y
         self.moves_count = 0
-        self.move_history = []
+        # Компактная история; history_limit - хранить только последние N ходов
+        self.move_history = MoveHistory(history_limit)
+        self.recorder = recorder  # Запись повтора (replay.ReplayRecorder) или None
     
     def reset_position(self):
         """Сбросить позицию игрока на стартовую"""
@@ -19,6 +159,8 @@ class Player:
         self.y = self.start_y
         self.moves_count = 0
         self.move_history.clear()
+        if self.recorder is not None:
+            self.recorder.restart((self.x, self.y))
     
     def set_start_position(self, x, y):
         """Установить новую стартовую позицию"""
@@ -26,13 +168,29 @@ class Player:
         self.start_y = y
         self.reset_position()
     
-    def move_to(self, new_x, new_y):
-        """Переместить игрока в новую позицию"""
+    def move_to(self, new_x, new_y, steps=1):
+        """Переместить игрока в новую позицию (steps - сколько клеток пройдено)"""
         old_pos = (self.x, self.y)
         self.x = new_x
         self.y = new_y
-        self.moves_count += 1
-        self.move_history.append((old_pos, (new_x, new_y)))
+        self.moves_count += steps
+        self.move_history.append_move(old_pos, (new_x, new_y))
+        if self.recorder is not None:
+            self.recorder.record_move(old_pos, (new_x, new_y))
+    
+    def move_along(self, directions, xs, ys):
+        """Пройти сразу много одиночных шагов (результат машины ходов).
+
+        directions - коды направлений (bytes), xs/ys - позиции до первого
+        шага и после каждого (длиной шагов + 1).
+        """
+        if not directions:
+            return
+        self.move_history.extend(xs[:-1], ys[:-1], xs[1:], ys[1:])
+        if self.recorder is not None:
+            self.recorder.record_steps(directions, xs, ys)
+        self.x, self.y = xs[-1], ys[-1]
+        self.moves_count += len(directions)
     
     def get_position(self):
         """Получить текущую позицию"""
@@ -55,70 +213,182 @@ class Player:
 class CommandInterpreter:
     """Интерпретатор команд для управления игроком"""
     
-    def __init__(self, player, maze):
+    def __init__(self, player, maze, max_moves=DEFAULT_MAX_MOVES,
+                 max_lines=DEFAULT_MAX_LINES, time_limit=DEFAULT_TIME_LIMIT, log_limit=None,
+                 use_vm=True):
         self.player = player
         self.maze = maze
-        self.execution_log = []
+        # Компактный журнал; log_limit - хранить только последние N записей
+        self.execution_log = MoveLog(log_limit)
         self.error_log = []
+        
+        # Лимиты (None - без ограничения) и счетчики текущего запуска
+        self.max_moves = max_moves
+        self.max_lines = max_lines
+        self.time_limit = time_limit
+        self.moves_executed = 0
+        self.lines_executed = 0
+        self.limit_error = None
+        self.deadline = None
+        self.use_vm = use_vm  # Простые программы выполнять машиной ходов (move_vm)
+        
+        # Для выполнения в фоновом потоке: слушатель ходов и флаг отмены
+        self.move_listener = None
+        self.cancelled = False
     
     def clear_logs(self):
         """Очистить логи выполнения"""
         self.execution_log.clear()
         self.error_log.clear()
     
-    def log_move(self, command, success, message=""):
-        """Записать движение в лог"""
-        self.execution_log.append({
-            'command': command,
-            'success': success,
-            'message': message,
-            'position': self.player.get_position()
-        })
-    
-    def move_up(self):
-        """Движение вверх"""
+    def log_move(self, command, success, steps=1, requested=1):
+        """Записать движение в лог (command - код команды из move_log)"""
+        position = (self.player.x, self.player.y)
+        self.execution_log.log(command, success, position, steps, requested)
+        if self.move_listener:
+            self.move_listener(command, success, position)
+    
+    def cancel(self):
+        """Попросить остановить программу (можно вызывать из другого потока).
+
+        Отмена необратима: для нового запуска нужен новый интерпретатор.
+        """
+        self.cancelled = True
+    
+    def count_move(self):
+        """Учесть вызов команды движения и проверить лимит ходов"""
+        # Лимит уже сработал, а код игрока перехватил исключение - останавливаем снова
+        if self.limit_error:
+            raise ExecutionLimitExceeded(self.limit_error)
+        if self.cancelled:
+            self.stop_execution("выполнение отменено")
+        self.moves_executed += 1
+        if self.max_moves is not None and self.moves_executed > self.max_moves:
+            self.stop_execution(f"превышен лимит ходов ({self.max_moves})")
+    
+    def stop_execution(self, reason):
+        """Прервать программу игрока с понятным сообщением"""
+        self.limit_error = f"Программа остановлена: {reason}"
+        raise ExecutionLimitExceeded(self.limit_error)
+    
+    def count_line(self):
+        """Учесть строку программы и проверить лимиты строк и времени.
+
+        Вызов вставлен в код игрока при компиляции (см. LineCounterInserter);
+        возвращает True, чтобы служить условием в генераторах.
+        """
+        # Код игрока мог перехватить остановку голым except - останавливаем снова
+        if self.limit_error:
+            raise ExecutionLimitExceeded(self.limit_error)
+        self.lines_executed += 1
+        if self.max_lines is not None and self.lines_executed > self.max_lines:
+            self.stop_execution(f"превышен лимит строк ({self.max_lines})")
+        if self.cancelled:
+            self.stop_execution("выполнение отменено")
+        # Срок хранится в self.deadline: его сдвигает тот, кто ждет (см. program_runner)
+        if (self.deadline is not None and self.lines_executed % TIME_CHECK_INTERVAL == 0
+                and time.perf_counter() > self.deadline):
+            self.stop_execution(f"превышен лимит времени ({self.time_limit} с)")
+        return True
+    
+    def move_up(self, steps=1):
+        """Движение вверх (steps - на сколько клеток)"""
+        if steps != 1:
+            return self.move_steps(COMMAND_UP, steps)
+        self.count_move()
         new_x, new_y = self.player.x, self.player.y - 1
         if self.maze.is_valid_move(new_x, new_y):
             self.player.move_to(new_x, new_y)
-            self.log_move("move_up()", True, f"Перемещение в ({new_x}, {new_y})")
+            self.log_move(COMMAND_UP, True)
             return True
         else:
-            self.log_move("move_up()", False, "Нельзя двигаться вверх - стена!")
+            self.log_move(COMMAND_UP, False, 0)
             return False
     
-    def move_down(self):
-        """Движение вниз"""
+    def move_down(self, steps=1):
+        """Движение вниз (steps - на сколько клеток)"""
+        if steps != 1:
+            return self.move_steps(COMMAND_DOWN, steps)
+        self.count_move()
         new_x, new_y = self.player.x, self.player.y + 1
         if self.maze.is_valid_move(new_x, new_y):
             self.player.move_to(new_x, new_y)
-            self.log_move("move_down()", True, f"Перемещение в ({new_x}, {new_y})")
+            self.log_move(COMMAND_DOWN, True)
             return True
         else:
-            self.log_move("move_down()", False, "Нельзя двигаться вниз - стена!")
+            self.log_move(COMMAND_DOWN, False, 0)
             return False
     
-    def move_left(self):
-        """Движение влево"""
+    def move_left(self, steps=1):
+        """Движение влево (steps - на сколько клеток)"""
+        if steps != 1:
+            return self.move_steps(COMMAND_LEFT, steps)
+        self.count_move()
         new_x, new_y = self.player.x - 1, self.player.y
         if self.maze.is_valid_move(new_x, new_y):
             self.player.move_to(new_x, new_y)
-            self.log_move("move_left()", True, f"Перемещение в ({new_x}, {new_y})")
+            self.log_move(COMMAND_LEFT, True)
             return True
         else:
-            self.log_move("move_left()", False, "Нельзя двигаться влево - стена!")
+            self.log_move(COMMAND_LEFT, False, 0)
             return False
     
-    def move_right(self):
-        """Движение вправо"""
+    def move_right(self, steps=1):
+        """Движение вправо (steps - на сколько клеток)"""
+        if steps != 1:
+            return self.move_steps(COMMAND_RIGHT, steps)
+        self.count_move()
         new_x, new_y = self.player.x + 1, self.player.y
         if self.maze.is_valid_move(new_x, new_y):
             self.player.move_to(new_x, new_y)
-            self.log_move("move_right()", True, f"Перемещение в ({new_x}, {new_y})")
+            self.log_move(COMMAND_RIGHT, True)
             return True
         else:
-            self.log_move("move_right()", False, "Нельзя двигаться вправо - стена!")
+            self.log_move(COMMAND_RIGHT, False, 0)
             return False
     
+    def run_up(self):
+        """Бежать вверх до стены"""
+        return self.run(COMMAND_UP)
+    
+    def run_down(self):
+        """Бежать вниз до стены"""
+        return self.run(COMMAND_DOWN)
+    
+    def run_left(self):
+        """Бежать влево до стены"""
+        return self.run(COMMAND_LEFT)
+    
+    def run_right(self):
+        """Бежать вправо до стены"""
+        return self.run(COMMAND_RIGHT)
+    
+    def jump(self, direction, steps):
+        """Сдвинуть игрока на steps клеток одним перемещением"""
+        dx, dy = DIRECTION_DELTAS[direction]
+        self.player.move_to(self.player.x + dx * steps, self.player.y + dy * steps, steps)
+    
+    def move_steps(self, direction, steps):
+        """Пройти до steps клеток за одну операцию; True - прошли все"""
+        if type(steps) is not int or steps < 0:
+            raise ValueError("Количество шагов должно быть целым числом не меньше 0")
+        self.count_move()
+        free = self.maze.get_free_run(self.player.x, self.player.y, direction)
+        moved = min(steps, free)
+        if moved:
+            self.jump(direction, moved)
+        self.log_move(direction, moved == steps, moved, steps)
+        return moved == steps
+    
+    def run(self, direction):
+        """Бежать до стены за одну операцию; возвращает число пройденных клеток"""
+        self.count_move()
+        moved = self.maze.get_free_run(self.player.x, self.player.y, direction)
+        if moved:
+            self.jump(direction, moved)
+        self.log_move(RUN_OFFSET + direction, moved > 0, moved, 0)
+        return moved
+    
     def get_position(self):
         """Получить текущую позицию игрока"""
         return self.player.get_position()
@@ -128,55 +398,162 @@ class CommandInterpreter:
         x, y = self.player.get_position()
         return self.maze.is_finish(x, y)
     
+    def compile_code(self, code):
+        """Скомпилировать код пользователя (с кэшем).
+
+        Возвращает (программа, None) или (None, сообщение об ошибке
+        с номером строки, если он известен), если код не компилируется.
+        Программа - пара из объекта кода и байткода ходов (см.
+        ProgramCache.compile).
+        """
+        try:
+            return program_cache.compile(code), None
+        except SyntaxError as e:
+            if e.lineno is None:
+                return None, f"Синтаксическая ошибка: {e.msg}"
+            return None, f"Синтаксическая ошибка в строке {e.lineno}: {e.msg}"
+        except (ValueError, MemoryError, RecursionError) as e:
+            # Нулевой байт, слишком длинное или глубоко вложенное выражение
+            return None, f"Ошибка компиляции: {str(e) or type(e).__name__}"
+    
+    def build_globals(self):
+        """Создать безопасный контекст для выполнения"""
+        return {
+            'move_up': self.move_up,
+            'move_down': self.move_down,
+            'move_left': self.move_left,
+            'move_right': self.move_right,
+            'run_up': self.run_up,
+            'run_down': self.run_down,
+            'run_left': self.run_left,
+            'run_right': self.run_right,
+            'get_position': self.get_position,
+            'is_at_finish': self.is_at_finish,
+            LINE_COUNTER_NAME: self.count_line,
+            '__builtins__': {
+                'range': range,
+                'len': len,
+                'print': print,
+                'for': 'for',  # Разрешаем циклы
+                'if': 'if',    # Разрешаем условия
+                'while': 'while'
+            }
+        }
+    
     def execute_code(self, code):
         """Выполнить код пользователя"""
         self.clear_logs()
         
+        # Синтаксические ошибки сообщаем до выполнения
+        program, error_msg = self.compile_code(code)
+        if program is None:
+            self.error_log.append(error_msg)
+            return False, error_msg
+        
+        return self.execute_compiled(program)
+    
+    def execute_compiled(self, program):
+        """Выполнить уже скомпилированную программу"""
+        self.clear_logs()
+        self.moves_executed = 0
+        self.lines_executed = 0
+        self.limit_error = None
+        code_object, move_program = program
+        
         try:
-            # Создаем безопасный контекст для выполнения
-            safe_globals = {
-                'move_up': self.move_up,
-                'move_down': self.move_down,
-                'move_left': self.move_left,
-                'move_right': self.move_right,
-                'get_position': self.get_position,
-                'is_at_finish': self.is_at_finish,
-                '__builtins__': {
-                    'range': range,
-                    'len': len,
-                    'print': print,
-                    'for': 'for',  # Разрешаем циклы
-                    'if': 'if',    # Разрешаем условия
-                    'while': 'while'
-                }
-            }
-            
-            # Выполняем код
-            exec(code, safe_globals)
+            # Простые программы - машиной ходов, остальное (и выход за лимиты) - через exec
+            if not (self.use_vm and move_program is not None and self.execute_moves(move_program)):
+                self.execute_counted(code_object)
             
             # Проверяем победу
             if self.is_at_finish():
-                self.log_move("FINISH", True, "🎉 Поздравляем! Вы достигли финиша!")
+                self.log_move(COMMAND_FINISH, True)
             
             return True, self.get_execution_summary()
             
+        except ExecutionLimitExceeded as e:
+            error_msg = str(e)
+            self.error_log.append(error_msg)
+            return False, error_msg
         except Exception as e:
             error_msg = f"Ошибка выполнения: {str(e)}"
             self.error_log.append(error_msg)
             return False, error_msg
     
+    def execute_counted(self, code_object):
+        """Выполнить объект кода через exec; строки считает вставленный счетчик"""
+        self.deadline = None
+        if self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        exec(code_object, self.build_globals())
+        
+        # Код игрока мог перехватить остановку голым except
+        if self.limit_error:
+            raise ExecutionLimitExceeded(self.limit_error)
+    
+    def execute_moves(self, move_program):
+        """Выполнить байткод ходов; False - программа упирается в лимит, нужен exec"""
+        if self.cancelled:
+            self.stop_execution("выполнение отменено")
+        
+        # Шаги машины - те же строки, что насчитал бы count_line (см. move_vm)
+        max_steps = self.max_lines if self.max_lines is not None else VM_MAX_STEPS
+        result, moves, steps = run_moves(move_program, self.maze, self.player.x, self.player.y,
+                                         self.max_moves, max_steps)
+        if result != RESULT_DONE:
+            return False
+        
+        self.moves_executed = len(moves)
+        self.lines_executed = steps
+        player = self.player
+        if self.move_listener is not None:
+            # Слушатель (фоновое выполнение) ждет ходы по одному, как от move_*()
+            for entry in moves:
+                direction, success = entry >> 1, entry & 1
+                if success:
+                    dx, dy = DIRECTION_DELTAS[direction]
+                    player.move_to(player.x + dx, player.y + dy)
+                self.log_move(direction, bool(success), success)
+            return True
+        
+        # Без слушателя ходы применяются разом: позиции - накопленными
+        # суммами смещений, журнал и история - целыми колонками
+        entries = moves.tobytes()
+        directions = entries.translate(ENTRY_DIRECTIONS, FAILED_ENTRIES)
+        path_xs = array('i', accumulate(array('b', directions.translate(DIRECTION_DX)), initial=player.x))
+        path_ys = array('i', accumulate(array('b', directions.translate(DIRECTION_DY)), initial=player.y))
+        log_xs = array('i', accumulate(array('b', entries.translate(ENTRY_DX)), initial=player.x))
+        log_ys = array('i', accumulate(array('b', entries.translate(ENTRY_DY)), initial=player.y))
+        successes = entries.translate(ENTRY_SUCCESSES)
+        player.move_along(directions, path_xs, path_ys)
+        ones = array('I', [1]) * len(entries)
+        self.execution_log.log_many(entries.translate(ENTRY_DIRECTIONS), successes,
+                                    log_xs[1:], log_ys[1:], successes, ones)
+        return True
+    
+    @classmethod
+    def execute_batch(cls, code, games):
+        """Выполнить одну программу на многих парах (maze, player) без перекомпиляции.
+
+        Возвращает список (success, message) в порядке games.
+        """
+        program, error_msg = cls(None, None).compile_code(code)
+        if program is None:
+            return [(False, error_msg) for _ in games]
+        return [cls(player, maze).execute_compiled(program) for maze, player in games]
+    
     def get_execution_summary(self):
         """Получить сводку выполнения"""
-        if not self.execution_log:
+        if not self.execution_log.total:
             return "Код выполнен, но команды движения не найдены."
         
         summary = []
-        summary.append(f"Выполнено команд: {len(self.execution_log)}")
+        summary.append(f"Выполнено команд: {self.execution_log.total}")
         summary.append(f"Общее количество ходов: {self.player.moves_count}")
         summary.append(f"Текущая позиция: {self.player.get_position()}")
         
         # Последние несколько команд
-        recent_commands = self.execution_log[-5:]
+        recent_commands = self.execution_log.recent(5)
         summary.append("\nПоследние команды:")
         for cmd in recent_commands:
             status = "✓" if cmd['success'] else "✗"
@@ -0,0 +1,88 @@
+"""
+Фоновое выполнение программы игрока
+
+Программа выполняется в отдельном потоке на копии игрока, а каждый ход
+отправляется событием в ограниченную очередь. Основной цикл забирает
+события с нужной скоростью и анимирует настоящего игрока, поэтому
+интерфейс не замирает, сколько бы ни работала программа.
+"""
+
+import queue
+import threading
+import time
+from player import Player, CommandInterpreter
+
+# Виды событий в очереди
+EVENT_MOVE = "move"
+EVENT_DONE = "done"
+
+# Как часто воркер, ждущий места в очереди, проверяет отмену (секунды)
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class ProgramRunner:
+    """Запуск программы игрока в фоновом потоке с потоком ходов в очередь"""
+
+    def __init__(self, code, maze, player, queue_size=256, **limits):
+        # Копия игрока: настоящий двигается только в основном потоке
+        shadow = Player(player.start_x, player.start_y)
+        shadow.x, shadow.y = player.get_position()
+        shadow.moves_count = player.moves_count
+
+        self.code = code
+        self.interpreter = CommandInterpreter(shadow, maze, **limits)
+        self.interpreter.move_listener = self.on_move
+        self.events = queue.Queue(maxsize=queue_size)
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.work, name="program-runner", daemon=True)
+
+    def start(self):
+        """Запустить программу"""
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Остановить программу немедленно и выбросить непоказанные ходы"""
+        self.cancel_event.set()
+        self.interpreter.cancel()
+        # Освобождаем очередь, чтобы воркер не ждал места
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                break
+
+    def is_running(self):
+        """Работает ли еще фоновый поток"""
+        return self.thread.is_alive()
+
+    def poll(self):
+        """Забрать следующее событие без ожидания (None - событий пока нет)"""
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+    def put(self, event):
+        """Положить событие в очередь, ожидая места, пока нет отмены"""
+        blocked_since = time.perf_counter()
+        while not self.cancel_event.is_set():
+            try:
+                self.events.put(event, timeout=CANCEL_POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        # Время ожидания анимации не считается в лимит времени программы
+        if self.interpreter.deadline is not None:
+            self.interpreter.deadline += time.perf_counter() - blocked_since
+        return not self.cancel_event.is_set()
+
+    def on_move(self, command, success, position):
+        """Слушатель ходов интерпретатора (вызывается в фоновом потоке)"""
+        if not self.put((EVENT_MOVE, command, success, position)):
+            self.interpreter.stop_execution("выполнение отменено")
+
+    def work(self):
+        """Тело фонового потока"""
+        success, message = self.interpreter.execute_code(self.code)
+        self.put((EVENT_DONE, success, message))
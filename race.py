@@ -0,0 +1,267 @@
+"""
+Гонка программ: много агентов на одном лабиринте
+
+Программа каждого участника один раз выполняется обычным интерпретатором
+(машиной ходов, если получится), и из его журнала получается лента
+попыток: по коду направления на такт, включая удары о стену. Одинаковые
+программы выполняются один раз. Дальше все агенты идут вместе: позиции
+лежат в массивах, и такт - это один векторный шаг NumPy по сетке
+лабиринта (проверка стен и финиша для всех агентов сразу), а не вызов
+Python на каждого агента.
+
+Свои агенты (например, тысячи случайных) двигаются через
+AgentSwarm.step(directions) напрямую. NumPy необязателен: без него тот же
+шаг делается циклом.
+"""
+
+from array import array
+from colors import DIRECTION_DELTAS
+from itertools import accumulate
+from lazy_numpy import load_numpy
+from maze import WALKABLE_CODES
+from move_log import COMMAND_FINISH, RUN_OFFSET
+from player import Player, CommandInterpreter, DEFAULT_MAX_MOVES
+
+# Код "стоять на месте": программа закончилась или агент уже на финише
+STAY = 4
+# Смещения по коду направления, последним - STAY
+STEP_DX = tuple(dx for dx, _ in DIRECTION_DELTAS) + (0,)
+STEP_DY = tuple(dy for _, dy in DIRECTION_DELTAS) + (0,)
+
+
+def record_tape(maze, code, max_moves=DEFAULT_MAX_MOVES):
+    """Выполнить программу и записать ленту попыток.
+
+    Каждая пройденная клетка - такт с ее направлением, каждый неудачный
+    ход (и run_*() у самой стены) - такт удара о стену на месте.
+    Возвращает (лента, None) или (лента до ошибки, сообщение об ошибке).
+    """
+    player = Player(*maze.start_pos, history_limit=1)
+    interpreter = CommandInterpreter(player, maze, max_moves=max_moves, log_limit=1)
+    tape = bytearray()
+    last_position = [maze.start_pos]
+
+    def record(command, success, position):
+        if command == COMMAND_FINISH:
+            return
+        direction = command % RUN_OFFSET
+        old_x, old_y = last_position[0]
+        steps = abs(position[0] - old_x) + abs(position[1] - old_y)
+        tape.extend(bytes((direction,)) * steps)
+        if not success:
+            tape.append(direction)
+        last_position[0] = position
+
+    interpreter.move_listener = record
+    success, message = interpreter.execute_code(code)
+    return bytes(tape), None if success else message
+
+
+class AgentSwarm:
+    """Позиции и счетчики агентов в массивах; step двигает всех за раз"""
+
+    def __init__(self, maze, count, start_pos=None):
+        self.maze = maze
+        self.count = count
+        self.tick = 0
+        start_x, start_y = start_pos or maze.start_pos
+        numpy = load_numpy()
+        self.vectorized = numpy is not None
+        if self.vectorized:
+            self.xs = numpy.full(count, start_x, dtype=numpy.int32)
+            self.ys = numpy.full(count, start_y, dtype=numpy.int32)
+            self.moves = numpy.zeros(count, dtype=numpy.int32)
+            self.bumps = numpy.zeros(count, dtype=numpy.int32)
+            self.finish_ticks = numpy.full(count, -1, dtype=numpy.int32)
+            self.grid = numpy.frombuffer(maze.get_grid_buffer(), dtype=numpy.uint8)
+            self.walkable = numpy.frombuffer(WALKABLE_CODES, dtype=numpy.uint8).astype(bool)
+            self.step_dx = numpy.array(STEP_DX, dtype=numpy.int32)
+            self.step_dy = numpy.array(STEP_DY, dtype=numpy.int32)
+        else:
+            self.xs = array('i', [start_x]) * count
+            self.ys = array('i', [start_y]) * count
+            self.moves = array('i', [0]) * count
+            self.bumps = array('i', [0]) * count
+            self.finish_ticks = array('i', [-1]) * count
+
+    def __len__(self):
+        return self.count
+
+    def step(self, directions):
+        """Один такт: агент i пытается шагнуть в directions[i] (код направления или STAY).
+
+        directions - массив NumPy, список или bytes длиной count.
+
+        Ход в стену не двигает агента и считается ударом; агент на финише
+        больше не двигается. Возвращает число агентов, которые сдвинулись.
+        """
+        self.tick += 1
+        if not self.vectorized:
+            return self.step_loop(directions)
+
+        numpy = load_numpy()
+        maze = self.maze
+        if isinstance(directions, (bytes, bytearray)):
+            directions = numpy.frombuffer(directions, dtype=numpy.uint8)
+        else:
+            directions = numpy.asarray(directions, dtype=numpy.uint8)
+        trying = (directions != STAY) & (self.finish_ticks < 0)
+        new_xs = self.xs + self.step_dx[directions]
+        new_ys = self.ys + self.step_dy[directions]
+        inside = (new_xs >= 0) & (new_xs < maze.width) & (new_ys >= 0) & (new_ys < maze.height)
+        cells = numpy.where(inside, new_ys * maze.width + new_xs, 0)
+        moving = trying & inside & self.walkable[self.grid[cells]]
+
+        numpy.copyto(self.xs, new_xs, where=moving)
+        numpy.copyto(self.ys, new_ys, where=moving)
+        self.moves += moving
+        self.bumps += trying & ~moving
+        finish_x, finish_y = maze.finish_pos
+        arrived = moving & (new_xs == finish_x) & (new_ys == finish_y)
+        self.finish_ticks[arrived] = self.tick
+        return int(numpy.count_nonzero(moving))
+
+    def step_loop(self, directions):
+        """Тот же такт циклом (без NumPy)"""
+        maze = self.maze
+        width, height = maze.width, maze.height
+        cells = maze.cells
+        finish_x, finish_y = maze.finish_pos
+        xs, ys = self.xs, self.ys
+        moved = 0
+        for agent, direction in enumerate(directions):
+            if direction == STAY or self.finish_ticks[agent] >= 0:
+                continue
+            x, y = xs[agent] + STEP_DX[direction], ys[agent] + STEP_DY[direction]
+            if 0 <= x < width and 0 <= y < height and WALKABLE_CODES[cells[y * width + x]]:
+                xs[agent], ys[agent] = x, y
+                self.moves[agent] += 1
+                moved += 1
+                if x == finish_x and y == finish_y:
+                    self.finish_ticks[agent] = self.tick
+            else:
+                self.bumps[agent] += 1
+        return moved
+
+    def get_position(self, agent):
+        return int(self.xs[agent]), int(self.ys[agent])
+
+    def finished_count(self):
+        """Сколько агентов уже на финише"""
+        if self.vectorized:
+            numpy = load_numpy()
+            return int(numpy.count_nonzero(self.finish_ticks >= 0))
+        return sum(1 for tick in self.finish_ticks if tick >= 0)
+
+    def occupied_cells(self, x0, y0, x1, y1):
+        """Занятые клетки в прямоугольнике [x0, x1) x [y0, y1): (xs, ys, агенты).
+
+        На клетку - один агент, с меньшим номером: для отрисовки этого хватает.
+        """
+        if not self.vectorized:
+            seen = {}
+            for agent in range(self.count):
+                x, y = self.xs[agent], self.ys[agent]
+                if x0 <= x < x1 and y0 <= y < y1:
+                    seen.setdefault((x, y), agent)
+            return ([x for x, _ in seen], [y for _, y in seen], list(seen.values()))
+
+        numpy = load_numpy()
+        xs, ys = self.xs, self.ys
+        visible = numpy.flatnonzero((xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1))
+        cells = ys[visible] * self.maze.width + xs[visible]
+        _, first = numpy.unique(cells, return_index=True)
+        agents = visible[first]
+        return xs[agents].tolist(), ys[agents].tolist(), agents.tolist()
+
+
+class Race:
+    """Гонка программ на одном лабиринте: ленты попыток и рой агентов"""
+
+    def __init__(self, maze, programs, max_moves=DEFAULT_MAX_MOVES):
+        """programs - словарь {имя участника: код программы}"""
+        if not programs:
+            raise ValueError("Для гонки нужна хотя бы одна программа")
+        self.maze = maze
+        self.names = list(programs)
+        self.errors = []
+        tapes_by_code = {}
+        tapes = []
+        for name in self.names:
+            code = programs[name]
+            if code not in tapes_by_code:
+                tapes_by_code[code] = record_tape(maze, code, max_moves)
+            tape, error = tapes_by_code[code]
+            tapes.append(tape)
+            self.errors.append(error)
+
+        # Все ленты подряд в одном буфере: лента агента i - с offsets[i], длиной lengths[i]
+        self.tapes = b"".join(tapes)
+        self.offsets = array('i', accumulate((len(tape) for tape in tapes[:-1]), initial=0))
+        self.lengths = array('i', (len(tape) for tape in tapes))
+        self.duration = max(self.lengths, default=0)
+        self.swarm = AgentSwarm(maze, len(self.names))
+        if self.swarm.vectorized:
+            numpy = load_numpy()
+            self.tape_codes = numpy.frombuffer(self.tapes + bytes((STAY,)), dtype=numpy.uint8)
+            self.tape_offsets = numpy.array(self.offsets, dtype=numpy.int64)
+            self.tape_lengths = numpy.array(self.lengths, dtype=numpy.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_tick(self):
+        return self.swarm.tick
+
+    def get_directions(self, tick):
+        """Коды направлений всех агентов на такте tick (STAY - лента кончилась)"""
+        if self.swarm.vectorized:
+            numpy = load_numpy()
+            playing = tick < self.tape_lengths
+            # Кончившиеся ленты смотрят на STAY в конце буфера
+            return self.tape_codes[numpy.where(playing, self.tape_offsets + tick, len(self.tapes))]
+        return [self.tapes[offset + tick] if tick < length else STAY
+                for offset, length in zip(self.offsets, self.lengths)]
+
+    def step(self):
+        """Сыграть один такт; False - гонка уже закончена"""
+        if self.is_finished():
+            return False
+        self.swarm.step(self.get_directions(self.swarm.tick))
+        return True
+
+    def run(self, ticks=None):
+        """Сыграть ticks тактов (None - до конца); возвращает число сыгранных"""
+        played = 0
+        while (ticks is None or played < ticks) and self.step():
+            played += 1
+        return played
+
+    def is_finished(self):
+        """Ленты кончились или все уже на финише"""
+        return self.swarm.tick >= self.duration or self.swarm.finished_count() == len(self)
+
+    def get_standings(self):
+        """Таблица: дошедшие по такту финиша, остальные по числу ходов (с ошибкой - ниже).
+
+        Строки - словари с именем, номером агента, позицией, ходами,
+        ударами о стену, тактом финиша (None - не дошел) и ошибкой программы.
+        """
+        swarm = self.swarm
+        rows = []
+        for agent, name in enumerate(self.names):
+            finish_tick = int(swarm.finish_ticks[agent])
+            rows.append({
+                'name': name,
+                'agent': agent,
+                'position': swarm.get_position(agent),
+                'moves': int(swarm.moves[agent]),
+                'bumps': int(swarm.bumps[agent]),
+                'finish_tick': finish_tick if finish_tick >= 0 else None,
+                'error': self.errors[agent],
+            })
+        rows.sort(key=lambda row: (row['finish_tick'] is None, row['finish_tick'] or 0,
+                                   row['error'] is not None, -row['moves'], row['bumps'],
+                                   row['agent']))
+        return rows
+
@@ -0,0 +1,267 @@
+"""
+Запись и просмотр повторов прохождения
+
+Повтор хранит не лабиринт, а его seed (лабиринт строится заново тем же
+генератором), и ходы по 2 бита: код направления из move_log, четыре хода
+в байте. Прыжки move_*(n)/run_*() раскладываются на одиночные шаги.
+Каждые CHECKPOINT_INTERVAL шагов запоминается позиция, поэтому позиция на
+любом шаге считается за O(CHECKPOINT_INTERVAL) = O(1), и просмотр можно
+перематывать и ускорять как угодно, не выполняя код игрока.
+
+Файл повтора (версия 1, little-endian):
+    magic       4s  b"LBRR"
+    version     H
+    algorithm   B   индекс в maze.ALGORITHMS
+    flags       B   зарезервировано
+    width       I
+    height      I
+    seed        Q
+    start       II  (x, y)
+    steps       I   число шагов
+    interval    I   шагов между контрольными точками
+    codes       ceil(steps / 4) байт, младшие биты байта - первый шаг
+    checkpoints (steps // interval + 1) * II - позиция перед шагом i * interval
+"""
+
+import struct
+import sys
+from array import array
+from colors import DIRECTION_DELTAS
+from itertools import accumulate
+from maze import Maze, ALGORITHMS
+from move_log import COMMAND_UP, COMMAND_DOWN, COMMAND_LEFT, COMMAND_RIGHT
+
+REPLAY_VERSION = 1
+REPLAY_MAGIC = b"LBRR"
+REPLAY_HEADER = struct.Struct("<4sHBBIIQIIII")
+MAX_SEED = 2 ** 64 - 1
+
+# Контрольная точка каждые 256 шагов: 8 байт на 64 байта ходов
+CHECKPOINT_INTERVAL = 256
+
+# Байт ходов -> 4 кода направлений (по байту на шаг)
+_UNPACK_CODES = tuple(bytes((byte >> shift) & 3 for shift in (0, 2, 4, 6)) for byte in range(256))
+# Код направления -> смещение + 1 (чтобы поместиться в байт для translate)
+_DX_PLUS_ONE = bytes(DIRECTION_DELTAS[code & 3][0] + 1 for code in range(256))
+_DY_PLUS_ONE = bytes(DIRECTION_DELTAS[code & 3][1] + 1 for code in range(256))
+
+
+def direction_between(old_pos, new_pos):
+    """Код направления и число шагов для перемещения по прямой"""
+    dx, dy = new_pos[0] - old_pos[0], new_pos[1] - old_pos[1]
+    if dx and dy:
+        raise ValueError("Перемещение не по прямой нельзя записать в повтор")
+    if dy:
+        return (COMMAND_DOWN if dy > 0 else COMMAND_UP), abs(dy)
+    return (COMMAND_RIGHT if dx > 0 else COMMAND_LEFT), abs(dx)
+
+
+class Replay:
+    """Повтор: seed лабиринта, старт, ходы по 2 бита и контрольные точки"""
+
+    def __init__(self, width, height, seed, algorithm, start_pos, codes, step_count,
+                 checkpoints=None, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.algorithm = algorithm
+        self.start_pos = start_pos
+        self.codes = codes
+        self.step_count = step_count
+        self.checkpoint_interval = checkpoint_interval
+        if checkpoints is None:
+            checkpoints = self.build_checkpoints()
+        self.checkpoints = checkpoints
+
+    def __len__(self):
+        return self.step_count
+
+    def direction_at(self, step):
+        """Код направления шага step"""
+        return (self.codes[step >> 2] >> ((step & 3) * 2)) & 3
+
+    def unpacked_codes(self):
+        """Коды всех шагов, по байту на шаг"""
+        unpack = _UNPACK_CODES
+        return b"".join(unpack[byte] for byte in self.codes)[:self.step_count]
+
+    def build_positions(self):
+        """Все позиции разом: (xs, ys) длиной steps + 1, позиция перед каждым шагом и в конце"""
+        codes = self.unpacked_codes()
+        x, y = self.start_pos
+        xs = array('i', accumulate((d - 1 for d in codes.translate(_DX_PLUS_ONE)), initial=x))
+        ys = array('i', accumulate((d - 1 for d in codes.translate(_DY_PLUS_ONE)), initial=y))
+        return xs, ys
+
+    def build_checkpoints(self):
+        """Контрольные точки из всех позиций (при записи они считаются по ходу)"""
+        xs, ys = self.build_positions()
+        checkpoints = array('i')
+        for step in range(0, self.step_count + 1, self.checkpoint_interval):
+            checkpoints.extend((xs[step], ys[step]))
+        return checkpoints
+
+    def position_at(self, step):
+        """Позиция после step шагов (0 - старт): ближайшая точка плюс не больше interval шагов"""
+        step = max(0, min(step, self.step_count))
+        checkpoint = step // self.checkpoint_interval
+        x, y = self.checkpoints[checkpoint * 2], self.checkpoints[checkpoint * 2 + 1]
+        for index in range(checkpoint * self.checkpoint_interval, step):
+            dx, dy = DIRECTION_DELTAS[self.direction_at(index)]
+            x, y = x + dx, y + dy
+        return x, y
+
+    def build_maze(self):
+        """Построить лабиринт повтора заново по seed"""
+        return Maze(self.width, self.height, self.algorithm, self.seed)
+
+    def encode(self):
+        """Закодировать повтор в байты файла"""
+        checkpoints = array('i', self.checkpoints)
+        if sys.byteorder != "little":
+            checkpoints.byteswap()
+        header = REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, ALGORITHMS.index(self.algorithm), 0,
+            self.width, self.height, self.seed, *self.start_pos,
+            self.step_count, self.checkpoint_interval
+        )
+        return header + bytes(self.codes) + checkpoints.tobytes()
+
+    @classmethod
+    def decode(cls, buffer):
+        """Прочитать повтор из байтов файла"""
+        (magic, version, algorithm, _, width, height, seed,
+         start_x, start_y, step_count, interval) = REPLAY_HEADER.unpack_from(buffer, 0)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Неверный формат файла повтора")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Неподдерживаемая версия файла повтора: {version}")
+
+        codes_end = REPLAY_HEADER.size + (step_count + 3) // 4
+        codes = bytes(buffer[REPLAY_HEADER.size:codes_end])
+        checkpoints = array('i')
+        checkpoints.frombytes(buffer[codes_end:codes_end + (step_count // interval + 1) * 8])
+        if sys.byteorder != "little":
+            checkpoints.byteswap()
+        return cls(width, height, seed, ALGORITHMS[algorithm], (start_x, start_y),
+                   codes, step_count, checkpoints, interval)
+
+    def save(self, path):
+        """Сохранить повтор в файл"""
+        with open(path, "wb") as file:
+            file.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        """Загрузить повтор из файла"""
+        with open(path, "rb") as file:
+            return cls.decode(file.read())
+
+
+class ReplayRecorder:
+    """Запись ходов игрока по мере игры (подключается к Player.recorder)"""
+
+    def __init__(self, maze, start_pos, checkpoint_interval=CHECKPOINT_INTERVAL):
+        if not isinstance(maze.seed, int) or not 0 <= maze.seed <= MAX_SEED:
+            raise ValueError("Повтор можно записать только для лабиринта с числовым seed")
+        self.maze = maze
+        self.checkpoint_interval = checkpoint_interval
+        self.restart(start_pos)
+
+    def restart(self, start_pos):
+        """Начать новую запись с позиции start_pos"""
+        self.start_pos = start_pos
+        self.x, self.y = start_pos
+        self.codes = bytearray()
+        self.step_count = 0
+        self.checkpoints = array('i', start_pos)
+
+    def __len__(self):
+        return self.step_count
+
+    def record_move(self, old_pos, new_pos):
+        """Записать перемещение (прыжок раскладывается на шаги)"""
+        if old_pos != (self.x, self.y):
+            raise ValueError("Перемещение не продолжает запись повтора")
+        direction, steps = direction_between(old_pos, new_pos)
+        dx, dy = DIRECTION_DELTAS[direction]
+        for _ in range(steps):
+            shift = (self.step_count & 3) * 2
+            if shift == 0:
+                self.codes.append(direction)
+            else:
+                self.codes[-1] |= direction << shift
+            self.step_count += 1
+            self.x, self.y = self.x + dx, self.y + dy
+            if self.step_count % self.checkpoint_interval == 0:
+                self.checkpoints.extend((self.x, self.y))
+
+    def record_steps(self, directions, xs, ys):
+        """Записать сразу много одиночных шагов.
+
+        directions - коды направлений (bytes), xs/ys - позиции до первого
+        шага и после каждого (длиной шагов + 1).
+        """
+        if (xs[0], ys[0]) != (self.x, self.y):
+            raise ValueError("Перемещение не продолжает запись повтора")
+        codes = self.codes
+        old_count = self.step_count
+        count = len(directions)
+
+        # Сначала дописываем неполный последний байт, дальше - по четыре шага в байт
+        index = 0
+        while index < count and (old_count + index) & 3:
+            codes[-1] |= directions[index] << (((old_count + index) & 3) * 2)
+            index += 1
+        rest = directions[index:]
+        codes.extend(a | b << 2 | c << 4 | d << 6
+                     for a, b, c, d in zip(rest[0::4], rest[1::4], rest[2::4], rest[3::4]))
+        tail = rest[len(rest) // 4 * 4:]
+        if tail:
+            codes.append(sum(code << (shift * 2) for shift, code in enumerate(tail)))
+
+        # Контрольные точки после шагов с номером, кратным interval
+        interval = self.checkpoint_interval
+        first = (old_count // interval + 1) * interval
+        for step in range(first, old_count + count + 1, interval):
+            self.checkpoints.extend((xs[step - old_count], ys[step - old_count]))
+        self.step_count = old_count + count
+        self.x, self.y = xs[-1], ys[-1]
+
+    def to_replay(self):
+        """Снимок записи в виде повтора"""
+        maze = self.maze
+        return Replay(maze.width, maze.height, maze.seed, maze.algorithm, self.start_pos,
+                      bytes(self.codes), self.step_count, array('i', self.checkpoints),
+                      self.checkpoint_interval)
+
+
+class ReplayPlayback:
+    """Просмотр повтора: текущий шаг, скорость (шагов в секунду) и пауза"""
+
+    def __init__(self, replay, speed=8.0):
+        self.replay = replay
+        self.speed = speed
+        self.step = 0.0
+        self.paused = False
+
+    def advance(self, seconds):
+        """Продвинуть просмотр на seconds секунд; True - шаг изменился"""
+        if self.paused or self.step >= len(self.replay):
+            return False
+        before = int(self.step)
+        self.step = min(float(len(self.replay)), self.step + seconds * self.speed)
+        return int(self.step) != before
+
+    def seek(self, step):
+        """Перейти к шагу step"""
+        self.step = float(max(0, min(step, len(self.replay))))
+
+    def get_step(self):
+        return int(self.step)
+
+    def get_position(self):
+        return self.replay.position_at(int(self.step))
+
+    def is_finished(self):
+        return self.step >= len(self.replay)
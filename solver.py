@@ -0,0 +1,181 @@
+"""
+Модуль поиска пути в лабиринте
+
+Главное - поле расстояний до финиша: один обход BFS от финиша по всей
+сетке, результат кэшируется в maze.distance_field. После этого
+"решаем ли лабиринт", "длина кратчайшего пути" и "лучший следующий ход"
+- это чтение одного-четырех элементов массива.
+"""
+
+import heapq
+from array import array
+from collections import deque
+from colors import DIRECTION_DELTAS
+from maze import WALKABLE_CODES
+
+UNREACHABLE = -1
+
+# Направления движения: имя -> (dx, dy)
+DIRECTIONS = dict(zip(('up', 'down', 'left', 'right'), DIRECTION_DELTAS))
+
+
+def _neighbor_offsets(width):
+    """Смещения соседей в плоской сетке: (имя направления, сдвиг индекса)"""
+    return [(name, dy * width + dx) for name, (dx, dy) in DIRECTIONS.items()]
+
+
+def _walkable_mask(maze):
+    """Проходимость каждой клетки (1 - можно встать) одним вызовом translate"""
+    return bytes(maze.cells).translate(WALKABLE_CODES)
+
+
+def compute_distance_field(maze, target=None):
+    """Расстояния от каждой клетки до target (по умолчанию - финиш).
+
+    Возвращает array('i') длиной width * height, UNREACHABLE для стен
+    и недостижимых клеток.
+    """
+    width, height = maze.width, maze.height
+    tx, ty = target or maze.finish_pos
+    field = array('i', [UNREACHABLE]) * (width * height)
+    if not maze.is_valid_move(tx, ty):
+        return field
+
+    walkable = _walkable_mask(maze)
+    offsets = [offset for _, offset in _neighbor_offsets(width)]
+    target_index = ty * width + tx
+    field[target_index] = 0
+    queue = deque([target_index])
+
+    while queue:
+        index = queue.popleft()
+        next_distance = field[index] + 1
+        x = index % width
+        for offset in offsets:
+            neighbor = index + offset
+            # Не переходить через левый/правый край строки
+            if offset == 1 and x == width - 1 or offset == -1 and x == 0:
+                continue
+            if 0 <= neighbor < len(field) and walkable[neighbor] and field[neighbor] == UNREACHABLE:
+                field[neighbor] = next_distance
+                queue.append(neighbor)
+
+    return field
+
+
+def get_distance_field(maze):
+    """Поле расстояний до финиша, закэшированное на лабиринте"""
+    if maze.distance_field is None:
+        maze.distance_field = compute_distance_field(maze)
+    return maze.distance_field
+
+
+def distance_to_finish(maze, x, y):
+    """Длина кратчайшего пути от (x, y) до финиша или None, если пути нет"""
+    if not (0 <= x < maze.width and 0 <= y < maze.height):
+        return None
+    distance = get_distance_field(maze)[y * maze.width + x]
+    return None if distance == UNREACHABLE else distance
+
+
+def is_solvable(maze):
+    """Проверить, что от старта можно дойти до финиша"""
+    return distance_to_finish(maze, *maze.start_pos) is not None
+
+
+def shortest_path_length(maze, x=None, y=None):
+    """Длина кратчайшего пути до финиша (по умолчанию - от старта)"""
+    if x is None or y is None:
+        x, y = maze.start_pos
+    return distance_to_finish(maze, x, y)
+
+
+def next_best_move(maze, x, y):
+    """Направление ('up', 'down', 'left', 'right') шага к финишу или None"""
+    distance = distance_to_finish(maze, x, y)
+    if not distance:
+        return None  # Уже на финише или финиш недостижим
+    for name, (dx, dy) in DIRECTIONS.items():
+        if distance_to_finish(maze, x + dx, y + dy) == distance - 1:
+            return name
+    return None
+
+
+def shortest_path(maze, x=None, y=None):
+    """Кратчайший путь до финиша списком клеток (по полю расстояний)"""
+    if x is None or y is None:
+        x, y = maze.start_pos
+    if distance_to_finish(maze, x, y) is None:
+        return []
+    path = [(x, y)]
+    while True:
+        direction = next_best_move(maze, x, y)
+        if direction is None:
+            return path
+        dx, dy = DIRECTIONS[direction]
+        x, y = x + dx, y + dy
+        path.append((x, y))
+
+
+def _restore_path(came_from, index, width):
+    """Восстановить путь по словарю предков"""
+    path = []
+    while index is not None:
+        path.append((index % width, index // width))
+        index = came_from[index]
+    path.reverse()
+    return path
+
+
+def bfs_path(maze, start, goal):
+    """Кратчайший путь между двумя клетками поиском в ширину"""
+    if not (maze.is_valid_move(*start) and maze.is_valid_move(*goal)):
+        return []
+    width = maze.width
+    start_index = start[1] * width + start[0]
+    goal_index = goal[1] * width + goal[0]
+    came_from = {start_index: None}
+    queue = deque([start_index])
+
+    while queue:
+        index = queue.popleft()
+        if index == goal_index:
+            return _restore_path(came_from, index, width)
+        x, y = index % width, index // width
+        for dx, dy in DIRECTIONS.values():
+            nx, ny = x + dx, y + dy
+            neighbor = ny * width + nx
+            if neighbor not in came_from and maze.is_valid_move(nx, ny):
+                came_from[neighbor] = index
+                queue.append(neighbor)
+    return []
+
+
+def astar_path(maze, start, goal):
+    """Кратчайший путь между двумя клетками алгоритмом A* (манхэттенская эвристика)"""
+    if not (maze.is_valid_move(*start) and maze.is_valid_move(*goal)):
+        return []
+    width = maze.width
+    gx, gy = goal
+    start_index = start[1] * width + start[0]
+    goal_index = gy * width + gx
+    came_from = {start_index: None}
+    cost = {start_index: 0}
+    heap = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start_index)]
+
+    while heap:
+        _, current_cost, index = heapq.heappop(heap)
+        if index == goal_index:
+            return _restore_path(came_from, index, width)
+        if current_cost > cost[index]:
+            continue  # Устаревшая запись в куче
+        x, y = index % width, index // width
+        for dx, dy in DIRECTIONS.values():
+            nx, ny = x + dx, y + dy
+            neighbor = ny * width + nx
+            new_cost = current_cost + 1
+            if maze.is_valid_move(nx, ny) and new_cost < cost.get(neighbor, new_cost + 1):
+                cost[neighbor] = new_cost
+                came_from[neighbor] = index
+                heapq.heappush(heap, (new_cost + abs(nx - gx) + abs(ny - gy), new_cost, neighbor))
+    return []
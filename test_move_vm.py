@@ -0,0 +1,103 @@
+"""
+Машина ходов и exec должны давать одинаковый результат
+
+Каждая программа выполняется дважды (use_vm=True и use_vm=False) с
+тесным лимитом строк и ходов; сравниваются итог, счетчики строк и ходов,
+позиция игрока и журналы.
+"""
+
+import random
+import unittest
+from maze import Maze
+from move_vm import compile_moves
+from player import Player, CommandInterpreter
+
+CONDITIONS = ("is_at_finish()", "not is_at_finish()", "True", "False",
+              "not True", "not False", "not not is_at_finish()")
+MOVES = ("move_up()", "move_down()", "move_left()", "move_right()")
+
+
+def random_block(rng, depth=0, indent=""):
+    """Случайное тело программы из подмножества move_vm"""
+    lines = []
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.random()
+        if depth < 3 and kind < 0.2:
+            lines.append(f"{indent}for i in range({rng.randint(0, 6)}):")
+            lines += random_block(rng, depth + 1, indent + "    ")
+        elif depth < 3 and kind < 0.35:
+            lines.append(f"{indent}while {rng.choice(CONDITIONS)}:")
+            lines += random_block(rng, depth + 1, indent + "    ")
+        elif depth < 3 and kind < 0.55:
+            lines.append(f"{indent}if {rng.choice(CONDITIONS)}:")
+            lines += random_block(rng, depth + 1, indent + "    ")
+            if rng.random() < 0.3:
+                lines.append(f"{indent}elif {rng.choice(CONDITIONS)}:")
+                lines += random_block(rng, depth + 1, indent + "    ")
+            if rng.random() < 0.5:
+                lines.append(f"{indent}else:")
+                lines += random_block(rng, depth + 1, indent + "    ")
+        elif kind < 0.62:
+            lines.append(indent + "pass")
+        else:
+            lines.append(indent + rng.choice(MOVES))
+    return lines
+
+
+def run_program(maze, code, use_vm, **limits):
+    """Выполнить программу и снять все, что видно снаружи"""
+    player = Player(*maze.start_pos)
+    interpreter = CommandInterpreter(player, maze, use_vm=use_vm, time_limit=None, **limits)
+    result = interpreter.execute_code(code)
+    log = interpreter.execution_log
+    history = player.move_history
+    return (result, interpreter.lines_executed, interpreter.moves_executed,
+            player.get_position(), player.moves_count,
+            [log.row(i) for i in range(len(log))],
+            [history.row(i) for i in range(len(history))])
+
+
+class MoveVmMatchesExecTest(unittest.TestCase):
+
+    def assert_same(self, maze, code, **limits):
+        self.assertEqual(run_program(maze, code, True, **limits),
+                         run_program(maze, code, False, **limits), code)
+
+    def test_constant_conditions_count_lines(self):
+        maze = Maze(13, 9, seed=1)
+        for code, max_lines in (("if False:\n    pass\n" * 7, 5),
+                                ("if not True:\n    pass\n" * 7, 5),
+                                ("while False:\n    pass\n" * 3 + "move_right()\n" * 3, 4),
+                                ("while not True:\n    pass\nmove_down()\n", 2),
+                                ("if True:\n    move_down()\n" * 3, 5)):
+            for limit in range(1, max_lines + 3):
+                self.assert_same(maze, code, max_lines=limit)
+
+    def test_loops_under_tight_line_limit(self):
+        maze = Maze(13, 9, seed=2)
+        for code in ("for i in range(4):\n    move_down()\n    pass\n",
+                     "while not is_at_finish():\n    move_right()\n",
+                     "while True:\n    pass\n"):
+            for limit in range(1, 20):
+                self.assert_same(maze, code, max_lines=limit)
+
+    def test_random_programs(self):
+        rng = random.Random(12)
+        for _ in range(1500):
+            maze = Maze(rng.choice((7, 13, 21)), rng.choice((5, 9, 15)), seed=rng.randrange(100))
+            code = "\n".join(random_block(rng)) + "\n"
+            self.assertIsNotNone(compile_moves(code))
+            self.assert_same(maze, code, max_lines=rng.choice((1, 2, 3, 5, 8, 13, 40, 200)),
+                             max_moves=rng.choice((None, 1, 3, 20)))
+
+    def test_huge_range_falls_back_to_exec(self):
+        maze = Maze(13, 9, seed=3)
+        for code in ("for i in range(5000000000):\n    pass\n",
+                     "for i in range(-3000000000, 0):\n    move_right()\n"):
+            self.assertIsNone(compile_moves(code))
+            result = run_program(maze, code, True, max_lines=50)
+            self.assertEqual(result[0], (False, "Программа остановлена: превышен лимит строк (50)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,81 +3,260 @@
 """
 
 import pygame
-from colors import Colors, CellType, WINDOW_WIDTH, WINDOW_HEIGHT
+from collections import OrderedDict
+from colors import Colors, CELL_COLORS, WINDOW_WIDTH, WINDOW_HEIGHT, TEXT_CACHE_SIZE
 from colors import MAZE_START_X, MAZE_START_Y, MAZE_WIDTH, MAZE_HEIGHT
 from colors import CODE_PANEL_X, CODE_PANEL_WIDTH
+from colors import MINIMAP_X, MINIMAP_Y, MINIMAP_WIDTH, MINIMAP_HEIGHT
+from colors import HUD_X, HUD_Y, HUD_WIDTH, HUD_HEIGHT, AGENT_COLORS
+from code_buffer import EditorState
+from maze import CELL_TYPES_BY_CODE
+from minimap import Minimap
+from viewport import Viewport
 
-class UI:
+# Цвет клетки по коду из компактной сетки
+CELL_COLORS_BY_CODE = tuple(CELL_COLORS[cell_type] for cell_type in CELL_TYPES_BY_CODE)
+
+class TextCache:
+    """LRU-кэш отрисованного текста по ключу (шрифт, текст, цвет)"""
+    
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, color):
+        """Получить поверхность с текстом, отрисовав ее только при промахе"""
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def reset_stats(self):
+        """Сбросить счетчики попаданий (например, перед замером кадра)"""
+        self.hits = 0
+        self.misses = 0
+    
+    def get_stats(self):
+        """Получить статистику кэша"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.surfaces),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+class UI(EditorState):
     """Класс для отрисовки пользовательского интерфейса"""
     
     def __init__(self, screen):
+        super().__init__()
         self.screen = screen
         
         # Шрифты
         self.font_small = pygame.font.Font(None, 18)
         self.font_medium = pygame.font.Font(None, 24)
         self.font_large = pygame.font.Font(None, 36)
+        self.text_cache = TextCache()
         
-        # Состояние UI
-        self.code_text = ""
-        self.output_text = "Добро пожаловать в игру!\nВведите команды для движения игрока."
-
-        self.cursor_pos = 0  # Позиция курсора в тексте
+        # Кэш статичной картинки видимой части лабиринта
+        self.viewport = Viewport(MAZE_WIDTH, MAZE_HEIGHT)
+        self.maze_surface = None
+        self.maze_surface_maze = None
+        self.maze_surface_view = None  # Положение камеры, для которого нарисована картинка
+        self.maze_cell_size = 0
+        self.maze_needs_full_redraw = True
+        self.last_player_rect = None
+        self.agent_sprites = []  # Кружки агентов гонки под текущий размер клетки
+        self.minimap = Minimap((MINIMAP_X, MINIMAP_Y, MINIMAP_WIDTH, MINIMAP_HEIGHT))
     
-    def draw_maze(self, maze, player):
-        """Отрисовка лабиринта и игрока"""
-        # Вычисление размера клетки
-        cell_size = min(MAZE_WIDTH // maze.width, MAZE_HEIGHT // maze.height)
+    def build_maze_surface(self, maze):
+        """Отрисовать видимые клетки лабиринта во внеэкранную поверхность"""
+        viewport = self.viewport
+        cell_size = viewport.cell_size
+        surface = pygame.Surface((MAZE_WIDTH, MAZE_HEIGHT))
         
         # Фон лабиринта
-        maze_rect = pygame.Rect(MAZE_START_X, MAZE_START_Y, MAZE_WIDTH, MAZE_HEIGHT)
-        pygame.draw.rect(self.screen, Colors.WHITE, maze_rect)
-        pygame.draw.rect(self.screen, Colors.BLACK, maze_rect, 2)
-        
-        # Отрисовка клеток лабиринта
-        for y in range(maze.height):
-            for x in range(maze.width):
-                cell_type = maze.get_cell_type(x, y)
-                
-                # Вычисление позиции клетки на экране
-                screen_x = MAZE_START_X + x * cell_size
-                screen_y = MAZE_START_Y + y * cell_size
-                
-                cell_rect = pygame.Rect(screen_x, screen_y, cell_size, cell_size)
-                
-                # Выбор цвета в зависимости от типа клетки
-                if cell_type == CellType.WALL:
-                    pygame.draw.rect(self.screen, Colors.BROWN, cell_rect)
-                elif cell_type == CellType.PATH:
-                    pygame.draw.rect(self.screen, Colors.WHITE, cell_rect)
-                elif cell_type == CellType.START:
-                    pygame.draw.rect(self.screen, Colors.GREEN, cell_rect)
-                elif cell_type == CellType.FINISH:
-                    pygame.draw.rect(self.screen, Colors.ORANGE, cell_rect)
+        maze_rect = surface.get_rect()
+        pygame.draw.rect(surface, Colors.WHITE, maze_rect)
+        pygame.draw.rect(surface, Colors.BLACK, maze_rect, 2)
+        
+        # Отрисовка только тех клеток, что попадают в окно камеры
+        cells = maze.cells
+        x0, y0, x1, y1 = viewport.get_visible_range()
+        for y in range(y0, y1):
+            row = y * maze.width
+            top = (y - y0) * cell_size
+            for x in range(x0, x1):
+                cell_rect = pygame.Rect((x - x0) * cell_size, top, cell_size, cell_size)
+                surface.fill(CELL_COLORS_BY_CODE[cells[row + x]], cell_rect)
                 
                 # Границы клеток для лучшей видимости
-                pygame.draw.rect(self.screen, Colors.LIGHT_GRAY, cell_rect, 1)
+                pygame.draw.rect(surface, Colors.LIGHT_GRAY, cell_rect, 1)
         
-        # Отрисовка игрока
-        player_screen_x = MAZE_START_X + player.x * cell_size
-        player_screen_y = MAZE_START_Y + player.y * cell_size
+        self.maze_surface = surface
+        self.maze_surface_maze = maze
+        self.maze_surface_view = viewport.get_state()
+        self.maze_cell_size = cell_size
+        self.maze_needs_full_redraw = True
+    
+    def invalidate_maze(self):
+        """Потребовать полную перерисовку лабиринта на следующем кадре"""
+        self.maze_needs_full_redraw = True
+    
+    def get_cell_rect(self, x, y):
+        """Прямоугольник клетки лабиринта на экране (обрезанный по окну камеры)"""
+        cell_size = self.maze_cell_size
+        px, py = self.viewport.cell_to_pixel(x, y)
+        rect = pygame.Rect(MAZE_START_X + px, MAZE_START_Y + py, cell_size, cell_size)
+        return rect.clip(self.get_maze_rect())
+    
+    def get_maze_rect(self):
+        """Прямоугольник области лабиринта на экране"""
+        return pygame.Rect(MAZE_START_X, MAZE_START_Y, MAZE_WIDTH, MAZE_HEIGHT)
+    
+    def scroll_maze(self, dx, dy):
+        """Прокрутить вид лабиринта на dx, dy клеток"""
+        self.viewport.scroll(dx, dy)
+    
+    def zoom_maze(self, steps, screen_pos=None):
+        """Изменить масштаб лабиринта; screen_pos - точка, которая остается на месте"""
+        anchor = None
+        if screen_pos is not None and self.get_maze_rect().collidepoint(screen_pos):
+            anchor = self.viewport.pixel_to_cell(screen_pos[0] - MAZE_START_X,
+                                                 screen_pos[1] - MAZE_START_Y)
+        return self.viewport.zoom(steps, anchor)
+    
+    def follow_player(self, player):
+        """Вернуть камеру к игроку и снова следовать за ним"""
+        self.viewport.follow = True
+        self.viewport.center_on(player.x, player.y)
+    
+    def draw_maze(self, maze, player, swarm=None):
+        """Отрисовка лабиринта и игрока, возвращает измененные прямоугольники.
+
+        swarm - агенты гонки (race.AgentSwarm): тогда лабиринт перерисовывается
+        каждый кадр, агенты рисуются поверх, а player - лидер гонки.
+        """
+        if maze is not self.maze_surface_maze:
+            self.viewport.set_maze(maze.width, maze.height)
+            self.viewport.center_on(player.x, player.y)
+        self.viewport.follow_cell(player.x, player.y)
+        
+        # Поверхность перестраивается только при смене лабиринта или сдвиге камеры
+        if maze is not self.maze_surface_maze or self.viewport.get_state() != self.maze_surface_view:
+            self.build_maze_surface(maze)
         
-        # Игрок как красный круг с небольшим отступом
-        center_x = player_screen_x + cell_size // 2
-        center_y = player_screen_y + cell_size // 2
-        radius = cell_size // 3
+        if swarm is not None:
+            self.maze_needs_full_redraw = True
+            self.last_player_rect = None
+        
+        dirty_rects = []
+        if self.maze_needs_full_redraw:
+            maze_rect = self.screen.blit(self.maze_surface, (MAZE_START_X, MAZE_START_Y))
+            dirty_rects.append(maze_rect)
+            self.maze_needs_full_redraw = False
+            if swarm is not None:
+                self.draw_agents(swarm)
+        elif self.last_player_rect:
+            # Стираем игрока на старом месте кусочком готовой поверхности
+            area = self.last_player_rect.move(-MAZE_START_X, -MAZE_START_Y)
+            dirty_rects.append(self.screen.blit(self.maze_surface, self.last_player_rect, area))
+        
+        # Отрисовка игрока
+        player_rect = self.get_cell_rect(player.x, player.y)
+        if not self.last_player_rect or player_rect != self.last_player_rect:
+            area = player_rect.move(-MAZE_START_X, -MAZE_START_Y)
+            self.screen.blit(self.maze_surface, player_rect, area)
         
-        pygame.draw.circle(self.screen, Colors.RED, (center_x, center_y), radius)
-        pygame.draw.circle(self.screen, Colors.BLACK, (center_x, center_y), radius, 2)
+        # Игрок как красный круг с небольшим отступом (если он в окне камеры)
+        if player_rect.size == (self.maze_cell_size, self.maze_cell_size):
+            radius = self.maze_cell_size // 3
+            pygame.draw.circle(self.screen, Colors.RED, player_rect.center, radius)
+            pygame.draw.circle(self.screen, Colors.BLACK, player_rect.center, radius, 2)
+        dirty_rects.append(player_rect)
+        self.last_player_rect = player_rect
         
         # Информация о лабиринте
-        info_y = MAZE_START_Y + MAZE_HEIGHT + 10
+        info_rect = pygame.Rect(MAZE_START_X, MAZE_START_Y + MAZE_HEIGHT + 10, MAZE_WIDTH, 20)
+        pygame.draw.rect(self.screen, Colors.WHITE, info_rect)
         stats = player.get_stats()
         info_text = f"Игрок: {stats['position']} | Ходов: {stats['moves']} | "
         info_text += f"Финиш: {maze.finish_pos} | Размер: {maze.width}x{maze.height}"
         
-        info_surface = self.font_small.render(info_text, True, Colors.BLACK)
-        self.screen.blit(info_surface, (MAZE_START_X, info_y))
+        info_surface = self.render_text(self.font_small, info_text, Colors.BLACK)
+        self.screen.blit(info_surface, info_rect.topleft)
+        dirty_rects.append(info_rect)
+        
+        return dirty_rects
+    
+    def get_agent_sprites(self):
+        """Кружки агентов по цветам AGENT_COLORS (перерисовываются при смене масштаба)"""
+        cell_size = self.maze_cell_size
+        if not self.agent_sprites or self.agent_sprites[0].get_width() != cell_size:
+            self.agent_sprites = []
+            for color in AGENT_COLORS:
+                sprite = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+                center = (cell_size // 2, cell_size // 2)
+                pygame.draw.circle(sprite, color, center, max(2, cell_size // 4))
+                self.agent_sprites.append(sprite)
+        return self.agent_sprites
+    
+    def draw_agents(self, swarm):
+        """Агенты гонки в видимой части лабиринта, одним пакетным blits"""
+        viewport = self.viewport
+        x0, y0, x1, y1 = viewport.get_visible_range()
+        xs, ys, agents = swarm.occupied_cells(x0, y0, x1, y1)
+        sprites = self.get_agent_sprites()
+        cell_size = self.maze_cell_size
+        left = MAZE_START_X - viewport.origin_x * cell_size
+        top = MAZE_START_Y - viewport.origin_y * cell_size
+        count = len(sprites)
+        self.screen.set_clip(self.get_maze_rect())
+        self.screen.blits([(sprites[agent % count], (left + x * cell_size, top + y * cell_size))
+                           for x, y, agent in zip(xs, ys, agents)], doreturn=False)
+        self.screen.set_clip(None)
+    
+    def draw_minimap(self, maze, player):
+        """Мини-карта для лабиринтов, которые не видны целиком; возвращает ее прямоугольник"""
+        if not self.viewport.is_scrollable():
+            pygame.draw.rect(self.screen, Colors.WHITE, self.minimap.rect)
+            return self.minimap.rect
+        return self.minimap.draw(self.screen, maze, player, self.viewport.get_visible_range())
+    
+    def draw_hud(self, stats=None):
+        """Панель производительности (stats из FrameProfiler; None - спрятать)"""
+        hud_rect = pygame.Rect(HUD_X, HUD_Y, HUD_WIDTH, HUD_HEIGHT)
+        pygame.draw.rect(self.screen, Colors.WHITE, hud_rect)
+        if stats is None:
+            return hud_rect
+        
+        pygame.draw.rect(self.screen, Colors.BLACK, hud_rect, 1)
+        lines = [
+            f"FPS: {stats['fps']:.1f} (кадров: {stats['total_frames']})",
+            f"Кадр p50: {stats['p50'] * 1e3:.2f} мс, p99: {stats['p99'] * 1e3:.2f} мс",
+        ]
+        if stats['slowest_phase']:
+            lines.append(f"Дольше всего: {stats['slowest_phase']} "
+                         f"({stats['slowest_phase_mean'] * 1e3:.2f} мс/кадр)")
+        lines.append("F3 - скрыть, F4 - выгрузить")
+        for i, line in enumerate(lines):
+            text = self.render_text(self.font_small, line, Colors.BLACK)
+            self.screen.blit(text, (HUD_X + 8, HUD_Y + 8 + i * 20))
+        return hud_rect
     
     def draw_code_panel(self, editing_code=False):
         """Отрисовка панели с кодом"""
@@ -87,7 +266,7 @@ class UI:
         pygame.draw.rect(self.screen, Colors.BLACK, panel_rect, 2)
         
         # Заголовок
-        title_text = self.font_large.render("Панель кода", True, Colors.BLACK)
+        title_text = self.render_text(self.font_large, "Панель кода", Colors.BLACK)
         self.screen.blit(title_text, (CODE_PANEL_X + 10, 30))
         
         # Область ввода кода
@@ -96,31 +275,21 @@ class UI:
         pygame.draw.rect(self.screen, color, code_rect)
         pygame.draw.rect(self.screen, Colors.BLACK, code_rect, 1)
         
-        # Текст кода
-        if self.code_text:
-            lines = self.code_text.split('\n')
-            for i, line in enumerate(lines[-8:]):  # Показываем последние 8 строк
-                text_surface = self.font_small.render(line, True, Colors.BLACK)
-                self.screen.blit(text_surface, (CODE_PANEL_X + 15, 75 + i * 20))
+        # Текст кода: рисуются только строки в окне редактора
+        for i, (_, line) in enumerate(self.code_buffer.get_visible_lines()):
+            text_surface = self.render_text(self.font_small, line, Colors.BLACK)
+            self.screen.blit(text_surface, (CODE_PANEL_X + 15, 75 + i * 20))
         
         # Курсор при редактировании
         if editing_code:
-            # Находим текущую строку и позицию в строке
-            text_before_cursor = self.code_text[:self.cursor_pos]
-            lines_before = text_before_cursor.split('\n')
-            current_line = len(lines_before) - 1
-            pos_in_line = len(lines_before[-1])
-    
-            # Используем реальную ширину текста
-            line_text = lines_before[-1]
+            current_line, _ = self.code_buffer.get_cursor()
+            # Ширина измеряется только по части текущей строки до курсора
+            line_text = self.code_buffer.get_cursor_prefix()
             text_width = self.font_small.size(line_text)[0] if line_text else 0
     
             cursor_x = CODE_PANEL_X + 15 + text_width
-            cursor_y = 75 + current_line * 20
-    
-            #  Убедимся что курсор видим (в пределах области)
-            if current_line >= 0 and current_line < 8:  # В видимой области
-                pygame.draw.line(self.screen, Colors.BLACK, (cursor_x, cursor_y), (cursor_x, cursor_y + 18), 2)
+            cursor_y = 75 + (current_line - self.code_buffer.top_line) * 20
+            pygame.draw.line(self.screen, Colors.BLACK, (cursor_x, cursor_y), (cursor_x, cursor_y + 18), 2)
         
         # Область вывода
         output_rect = pygame.Rect(CODE_PANEL_X + 10, 290, CODE_PANEL_WIDTH - 20, 200)
@@ -128,12 +297,12 @@ class UI:
         pygame.draw.rect(self.screen, Colors.BLACK, output_rect, 1)
         
         # Текст вывода
-        output_label = self.font_medium.render("Вывод:", True, Colors.BLACK)
+        output_label = self.render_text(self.font_medium, "Вывод:", Colors.BLACK)
         self.screen.blit(output_label, (CODE_PANEL_X + 15, 295))
         
         lines = self.output_text.split('\n')
         for i, line in enumerate(lines[:8]):  # Показываем первые 8 строк
-            text_surface = self.font_small.render(line, True, Colors.DARK_GRAY)
+            text_surface = self.render_text(self.font_small, line, Colors.DARK_GRAY)
             self.screen.blit(text_surface, (CODE_PANEL_X + 15, 320 + i * 20))
     
     def draw_buttons(self):
@@ -144,7 +313,7 @@ class UI:
         execute_btn = pygame.Rect(CODE_PANEL_X + 10, button_y, 100, 40)
         pygame.draw.rect(self.screen, Colors.GREEN, execute_btn)
         pygame.draw.rect(self.screen, Colors.BLACK, execute_btn, 2)
-        execute_text = self.font_medium.render("Выполнить", True, Colors.BLACK)
+        execute_text = self.render_text(self.font_medium, "Выполнить", Colors.BLACK)
         text_rect = execute_text.get_rect(center=execute_btn.center)
         self.screen.blit(execute_text, text_rect)
         
@@ -152,7 +321,7 @@ class UI:
         clear_btn = pygame.Rect(CODE_PANEL_X + 120, button_y, 100, 40)
         pygame.draw.rect(self.screen, Colors.YELLOW, clear_btn)
         pygame.draw.rect(self.screen, Colors.BLACK, clear_btn, 2)
-        clear_text = self.font_medium.render("Очистить", True, Colors.BLACK)
+        clear_text = self.render_text(self.font_medium, "Очистить", Colors.BLACK)
         text_rect = clear_text.get_rect(center=clear_btn.center)
         self.screen.blit(clear_text, text_rect)
         
@@ -160,7 +329,7 @@ class UI:
         new_maze_btn = pygame.Rect(CODE_PANEL_X + 230, button_y, 120, 40)
         pygame.draw.rect(self.screen, Colors.BLUE, new_maze_btn)
         pygame.draw.rect(self.screen, Colors.BLACK, new_maze_btn, 2)
-        new_text = self.font_small.render("Новый лабиринт", True, Colors.WHITE)
+        new_text = self.render_text(self.font_small, "Новый лабиринт", Colors.WHITE)
         text_rect = new_text.get_rect(center=new_maze_btn.center)
         self.screen.blit(new_text, text_rect)
     
@@ -171,11 +340,13 @@ class UI:
             "F1 - Меню",
             "F2 - Игра", 
             "ESC - Выход",
-            "Кликните в поле кода для ввода"
+            "Кликните в поле кода для ввода",
+            "Стрелки/колесо - обзор, C - к игроку",
+            "F3 - производительность, F5/F6 - повтор"
         ]
         
         for i, hint in enumerate(hints):
-            hint_text = self.font_small.render(hint, True, Colors.DARK_GRAY)
+            hint_text = self.render_text(self.font_small, hint, Colors.DARK_GRAY)
             self.screen.blit(hint_text, (CODE_PANEL_X + 15, hint_y + i * 20))
     
     def draw_menu(self):
@@ -184,7 +355,7 @@ class UI:
         self.screen.fill(Colors.DARK_GRAY)
         
         # Заголовок
-        title = self.font_large.render("ЛАБИРИНТ С ПРОГРАММИРОВАНИЕМ", True, Colors.WHITE)
+        title = self.render_text(self.font_large, "ЛАБИРИНТ С ПРОГРАММИРОВАНИЕМ", Colors.WHITE)
         title_rect = title.get_rect(center=(WINDOW_WIDTH // 2, 200))
         self.screen.blit(title, title_rect)
         
@@ -197,15 +368,24 @@ class UI:
             "• move_down() - движение вниз", 
             "• move_left() - движение влево",
             "• move_right() - движение вправо",
+            "• move_right(3) - на несколько клеток, run_right() - до стены",
             "",
             "Нажмите F2 для начала игры"
         ]
         
         for i, line in enumerate(description):
-            text = self.font_medium.render(line, True, Colors.WHITE)
+            text = self.render_text(self.font_medium, line, Colors.WHITE)
             text_rect = text.get_rect(center=(WINDOW_WIDTH // 2, 300 + i * 30))
             self.screen.blit(text, text_rect)
     
+    def render_text(self, font, text, color):
+        """Отрисовать текст через кэш (антиалиасинг включен всегда)"""
+        return self.text_cache.render(font, text, color)
+    
+    def get_side_panel_rect(self):
+        """Прямоугольник правой колонки (панель кода, подсказки, кнопки)"""
+        return pygame.Rect(CODE_PANEL_X, 0, WINDOW_WIDTH - CODE_PANEL_X, WINDOW_HEIGHT)
+    
     def get_button_rects(self):
         """Получить прямоугольники кнопок для обработки кликов"""
         button_y = WINDOW_HEIGHT - 60
@@ -216,27 +396,17 @@ class UI:
             'code_area': pygame.Rect(CODE_PANEL_X + 10, 70, CODE_PANEL_WIDTH - 20, 200)
         }
     
-    def set_code_text(self, text):
-        """Установить текст кода"""
-        self.code_text = text
-        self.cursor_pos = len(text)  # Курсор в конец строки
-
-    
-    def get_code_text(self):
-        """Получить текст кода"""
-        return self.code_text
-    
-    def set_output_text(self, text):
-        """Установить текст вывода"""
-        self.output_text = text
-    
-    def add_character(self, char):
-        """Добавить символ к коду"""
-        self.code_text = self.code_text[:self.cursor_pos] + char + self.code_text[self.cursor_pos:]
-        self.cursor_pos += 1
-    
-    def remove_character(self):
-        """Удалить последний символ из кода"""
-        if self.cursor_pos > 0:
-            self.code_text = self.code_text[:self.cursor_pos-1] + self.code_text[self.cursor_pos:]
-            self.cursor_pos -= 1
+    def move_cursor(self, key):
+        """Переместить курсор клавишей-стрелкой, Home или End"""
+        if key == pygame.K_LEFT:
+            self.code_buffer.move_cursor(columns=-1)
+        elif key == pygame.K_RIGHT:
+            self.code_buffer.move_cursor(columns=1)
+        elif key == pygame.K_UP:
+            self.code_buffer.move_cursor(lines=-1)
+        elif key == pygame.K_DOWN:
+            self.code_buffer.move_cursor(lines=1)
+        elif key == pygame.K_HOME:
+            self.code_buffer.move_to_line_start()
+        elif key == pygame.K_END:
+            self.code_buffer.move_to_line_end()
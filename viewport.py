@@ -0,0 +1,130 @@
+"""
+Камера (окно просмотра) лабиринта
+
+Большой лабиринт не помещается на экран даже по пикселю на клетку,
+поэтому рисуется только видимое окно: размер клетки не меньше
+MIN_CELL_SIZE, а камера следует за игроком, прокручивается и
+масштабируется. Модуль не зависит от pygame - только арифметика клеток
+и пикселей, так что стоимость кадра зависит от размера экрана, а не
+лабиринта.
+"""
+
+from colors import MIN_CELL_SIZE, MAX_CELL_SIZE, CAMERA_MARGIN
+
+
+class Viewport:
+    """Окно просмотра лабиринта размером width x height пикселей"""
+
+    def __init__(self, width, height, min_cell_size=MIN_CELL_SIZE,
+                 max_cell_size=MAX_CELL_SIZE, margin=CAMERA_MARGIN):
+        self.width = width
+        self.height = height
+        self.min_cell_size = min_cell_size
+        self.max_cell_size = max_cell_size
+        self.margin = margin
+        self.set_maze(1, 1)
+
+    def set_maze(self, maze_width, maze_height):
+        """Настроить камеру на новый лабиринт: весь целиком, если он помещается"""
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        fit_cell_size = min(self.width // maze_width, self.height // maze_height)
+        # Мельче, чем "весь лабиринт на экране", уменьшать нет смысла
+        self.smallest_cell_size = max(fit_cell_size, self.min_cell_size)
+        self.cell_size = self.smallest_cell_size
+        self.origin_x = 0
+        self.origin_y = 0
+        self.follow = True
+
+    @property
+    def columns(self):
+        """Сколько клеток (в том числе неполных) видно по горизонтали"""
+        return min(self.maze_width, -(-self.width // self.cell_size))
+
+    @property
+    def rows(self):
+        """Сколько клеток (в том числе неполных) видно по вертикали"""
+        return min(self.maze_height, -(-self.height // self.cell_size))
+
+    def is_scrollable(self):
+        """Виден ли лабиринт не целиком"""
+        return (self.maze_width * self.cell_size > self.width
+                or self.maze_height * self.cell_size > self.height)
+
+    def get_state(self):
+        """Положение и масштаб: картинку окна нужно перестроить, когда они меняются"""
+        return self.origin_x, self.origin_y, self.cell_size
+
+    def clamp(self):
+        """Не показывать пустоту за краем лабиринта"""
+        full_columns = self.width // self.cell_size
+        full_rows = self.height // self.cell_size
+        self.origin_x = max(0, min(self.origin_x, self.maze_width - full_columns))
+        self.origin_y = max(0, min(self.origin_y, self.maze_height - full_rows))
+
+    def get_visible_range(self):
+        """Видимые клетки: (x0, y0, x1, y1), правая и нижняя границы не включаются"""
+        x0, y0 = self.origin_x, self.origin_y
+        return (x0, y0, min(self.maze_width, x0 + self.columns),
+                min(self.maze_height, y0 + self.rows))
+
+    def cell_to_pixel(self, x, y):
+        """Левый верхний угол клетки относительно окна"""
+        return (x - self.origin_x) * self.cell_size, (y - self.origin_y) * self.cell_size
+
+    def pixel_to_cell(self, px, py):
+        """Клетка под точкой окна"""
+        return self.origin_x + px // self.cell_size, self.origin_y + py // self.cell_size
+
+    def center_on(self, x, y):
+        """Поставить клетку в центр окна"""
+        self.origin_x = x - self.width // self.cell_size // 2
+        self.origin_y = y - self.height // self.cell_size // 2
+        self.clamp()
+
+    def follow_cell(self, x, y):
+        """Сдвинуть камеру, если клетка подошла к краю ближе margin.
+
+        Камера перескакивает так, чтобы клетка оказалась в центре: окно
+        перестраивается редко, а не на каждом шаге.
+        """
+        if not self.follow:
+            return False
+        state = self.get_state()
+        margin = min(self.margin, (self.width // self.cell_size - 1) // 2,
+                     (self.height // self.cell_size - 1) // 2)
+        x0, y0, _, _ = self.get_visible_range()
+        x1 = x0 + self.width // self.cell_size
+        y1 = y0 + self.height // self.cell_size
+        if not (x0 + margin <= x < x1 - margin and y0 + margin <= y < y1 - margin):
+            self.center_on(x, y)
+        return self.get_state() != state
+
+    def scroll(self, dx, dy):
+        """Прокрутить на dx, dy клеток (камера перестает следовать за игроком)"""
+        self.origin_x += dx
+        self.origin_y += dy
+        self.follow = False
+        self.clamp()
+
+    def zoom(self, steps, anchor=None):
+        """Увеличить (steps > 0) или уменьшить масштаб вдвое за шаг.
+
+        anchor - клетка, которая остается на месте (по умолчанию центр окна).
+        """
+        cell_size = self.cell_size
+        for _ in range(abs(steps)):
+            cell_size = cell_size * 2 if steps > 0 else cell_size // 2
+        cell_size = max(self.smallest_cell_size,
+                        min(cell_size, max(self.max_cell_size, self.smallest_cell_size)))
+        if cell_size == self.cell_size:
+            return False
+
+        if anchor is None:
+            anchor = self.pixel_to_cell(self.width // 2, self.height // 2)
+        px, py = self.cell_to_pixel(*anchor)
+        self.cell_size = cell_size
+        self.origin_x = anchor[0] - px // cell_size
+        self.origin_y = anchor[1] - py // cell_size
+        self.clamp()
+        return True